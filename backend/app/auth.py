@@ -1,21 +1,30 @@
 """
 Authentication utilities for Emiti Metrics
-JWT tokens + bcrypt password hashing + refresh tokens
+JWT tokens + argon2/bcrypt password hashing + refresh tokens
 """
 import os
+import asyncio
 import logging
 import secrets
 import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
+from typing import NamedTuple, Optional, Tuple
+
+from cachetools import TTLCache
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import JWTError, jwt
+import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
-from .database import get_db, UserDB, ClientDB, RefreshTokenDB
+from .database import get_db, get_async_db, UserDB, ClientDB, RefreshTokenDB
+from .services.audit import log_action
 
 logger = logging.getLogger(__name__)
 
@@ -30,20 +39,79 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 
 # Token expiration settings
-ACCESS_TOKEN_EXPIRE_MINUTES = 15  # Short-lived access token
-ACCESS_TOKEN_EXPIRE_HOURS = 24    # Legacy: for backwards compatibility
+ACCESS_TOKEN_EXPIRE_MINUTES = 15  # Short-lived access token; also bounds how stale its claims can be
 REFRESH_TOKEN_EXPIRE_DAYS = 7     # Long-lived refresh token
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Rows deleted per statement when purging expired refresh tokens
+REFRESH_TOKEN_CLEANUP_BATCH_SIZE = 1000
+
+# Password hashing - argon2id for new hashes, bcrypt kept to verify legacy ones
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=2,
+    argon2__memory_cost=65536,
+    argon2__parallelism=2,
+)
 
 # Bearer token security
 security = HTTPBearer()
 
+# Hot-path statements built once at import and reused with bound parameters
+_SELECT_USER_BY_ID = select(UserDB).where(UserDB.id == bindparam("uid"))
+_SELECT_REFRESH_TOKEN_BY_HASH = select(RefreshTokenDB).where(RefreshTokenDB.token_hash == bindparam("h"))
+
+
+# ==================== CURRENT USER CACHE ====================
+
+class CachedUser(NamedTuple):
+    """Minimal user fields needed to authorize a request."""
+    id: int
+    email: str
+    role: str
+    is_active: bool
+
+
+# Keyed by (user_id, token iat) so a new login always starts with a fresh entry
+USER_CACHE_TTL_SECONDS = 60
+_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
+
+
+def invalidate_user(user_id: int) -> None:
+    """
+    Drop every cached entry for a user (logout, password or role change).
+
+    Only affects legacy access tokens without claims. Tokens issued with
+    user_token_claims keep their role/active values until they expire
+    (ACCESS_TOKEN_EXPIRE_MINUTES); use get_current_db_user where that
+    staleness is not acceptable.
+    """
+    with _user_cache_lock:
+        for key in [k for k in _user_cache.keys() if k[0] == user_id]:
+            _user_cache.pop(key, None)
+
+
+# Opt-in memo of verify verdicts for repeated identical checks (tests, scripts).
+# Only a BLAKE2b digest of the pair is kept, never the plaintext.
+ENABLE_VERIFY_CACHE = os.getenv("ENABLE_VERIFY_CACHE", "false").lower() == "true"
+_verify_cache: TTLCache = TTLCache(maxsize=1024, ttl=300)
+_verify_cache_lock = threading.Lock()
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    if not ENABLE_VERIFY_CACHE:
+        return pwd_context.verify(plain_password, hashed_password)
+
+    key = hashlib.blake2b(f"{plain_password}\0{hashed_password}".encode()).digest()
+    with _verify_cache_lock:
+        verdict = _verify_cache.get(key)
+    if verdict is None:
+        verdict = pwd_context.verify(plain_password, hashed_password)
+        with _verify_cache_lock:
+            _verify_cache[key] = verdict
+    return verdict
 
 
 def get_password_hash(password: str) -> str:
@@ -51,11 +119,53 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+# Hashing runs in a bounded thread pool (argon2/bcrypt release the GIL) so
+# a slow verify never stalls the event loop. Created lazily, after fork.
+_hash_pool: Optional[ThreadPoolExecutor] = None
+_hash_pool_lock = threading.Lock()
+
+
+def _get_hash_pool() -> ThreadPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        with _hash_pool_lock:
+            if _hash_pool is None:
+                _hash_pool = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1,
+                    thread_name_prefix="password-hash"
+                )
+    return _hash_pool
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_pool(), verify_password, plain_password, hashed_password)
+
+
+async def aget_password_hash(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_hash_pool(), get_password_hash, password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check if a stored hash uses a deprecated scheme or outdated parameters."""
+    return pwd_context.needs_update(hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token."""
+    """
+    Create a JWT access token.
+
+    Defaults to ACCESS_TOKEN_EXPIRE_MINUTES: get_current_user trusts the
+    role/active claims until expiry, so long-lived tokens would ignore a
+    deactivation or role change for their whole lifetime.
+    """
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(hours=ACCESS_TOKEN_EXPIRE_HOURS))
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    to_encode.update({"exp": expire, "iat": now})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
@@ -64,13 +174,23 @@ def decode_token(token: str) -> Optional[dict]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
-    except JWTError:
+    except jwt.PyJWTError:
         return None
 
 
-def hash_token(token: str) -> str:
-    """Hash a token using SHA-256 for secure storage."""
-    return hashlib.sha256(token.encode()).hexdigest()
+def hash_token(token: str) -> bytes:
+    """Hash a token using BLAKE2b-128 for secure storage (raw 16-byte digest)."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _legacy_hash_token(token: str) -> bytes:
+    """
+    SHA-256 digest used for refresh tokens issued before the BLAKE2b switch
+    (init_db converts their stored hex to these bytes). Accepted on lookup so
+    the upgrade doesn't log everyone out; remove once REFRESH_TOKEN_EXPIRE_DAYS
+    have passed since the deploy.
+    """
+    return hashlib.sha256(token.encode()).digest()
 
 
 def create_refresh_token(user_id: int, db: Session) -> Tuple[str, RefreshTokenDB]:
@@ -85,8 +205,8 @@ def create_refresh_token(user_id: int, db: Session) -> Tuple[str, RefreshTokenDB
     raw_token = secrets.token_urlsafe(64)
     token_hash = hash_token(raw_token)
 
-    # Calculate expiration
-    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    # Calculate expiration (Unix epoch seconds)
+    expires_at = int(time.time()) + REFRESH_TOKEN_EXPIRE_DAYS * 86400
 
     # Store hashed token in database
     refresh_token_db = RefreshTokenDB(
@@ -99,7 +219,7 @@ def create_refresh_token(user_id: int, db: Session) -> Tuple[str, RefreshTokenDB
     db.commit()
     db.refresh(refresh_token_db)
 
-    logger.info(f"Created refresh token for user {user_id}, expires at {expires_at}")
+    logger.info(f"Created refresh token for user {user_id}, expires at {datetime.utcfromtimestamp(expires_at)}")
 
     return raw_token, refresh_token_db
 
@@ -118,9 +238,11 @@ def verify_refresh_token(raw_token: str, db: Session) -> Optional[RefreshTokenDB
     token_hash = hash_token(raw_token)
 
     # Find token in database
-    refresh_token = db.query(RefreshTokenDB).filter(
-        RefreshTokenDB.token_hash == token_hash
-    ).first()
+    refresh_token = db.execute(_SELECT_REFRESH_TOKEN_BY_HASH, {"h": token_hash}).scalar_one_or_none()
+    if not refresh_token:
+        refresh_token = db.execute(
+            _SELECT_REFRESH_TOKEN_BY_HASH, {"h": _legacy_hash_token(raw_token)}
+        ).scalar_one_or_none()
 
     if not refresh_token:
         logger.warning("Refresh token not found in database")
@@ -132,7 +254,7 @@ def verify_refresh_token(raw_token: str, db: Session) -> Optional[RefreshTokenDB
         return None
 
     # Check if expired
-    if refresh_token.expires_at < datetime.utcnow():
+    if refresh_token.expires_at < int(time.time()):
         logger.warning(f"Attempted to use expired refresh token for user {refresh_token.user_id}")
         return None
 
@@ -141,8 +263,14 @@ def verify_refresh_token(raw_token: str, db: Session) -> Optional[RefreshTokenDB
 
 def revoke_refresh_token(refresh_token: RefreshTokenDB, db: Session) -> None:
     """Revoke a single refresh token."""
-    refresh_token.is_revoked = True
+    db.execute(
+        update(RefreshTokenDB)
+        .where(RefreshTokenDB.id == refresh_token.id)
+        .values(is_revoked=True)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
+    invalidate_user(refresh_token.user_id)
     logger.info(f"Revoked refresh token {refresh_token.id} for user {refresh_token.user_id}")
 
 
@@ -153,13 +281,19 @@ def revoke_all_user_refresh_tokens(user_id: int, db: Session) -> int:
     Returns:
         Number of tokens revoked
     """
-    result = db.query(RefreshTokenDB).filter(
-        RefreshTokenDB.user_id == user_id,
-        RefreshTokenDB.is_revoked == False
-    ).update({"is_revoked": True})
+    result = db.execute(
+        update(RefreshTokenDB)
+        .where(
+            RefreshTokenDB.user_id == user_id,
+            RefreshTokenDB.is_revoked == False  # matches the ix_rt_user_active predicate
+        )
+        .values(is_revoked=True)
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
-    logger.info(f"Revoked {result} refresh tokens for user {user_id}")
-    return result
+    invalidate_user(user_id)
+    logger.info(f"Revoked {result.rowcount} refresh tokens for user {user_id}")
+    return result.rowcount
 
 
 def cleanup_expired_refresh_tokens(db: Session) -> int:
@@ -167,31 +301,52 @@ def cleanup_expired_refresh_tokens(db: Session) -> int:
     Remove expired refresh tokens from the database.
     Should be called periodically (e.g., via a scheduled task).
 
+    Deletes in batches of REFRESH_TOKEN_CLEANUP_BATCH_SIZE, committing after
+    each one, so a large backlog never holds a long lock on the table.
+
     Returns:
         Number of tokens deleted
     """
-    result = db.query(RefreshTokenDB).filter(
-        RefreshTokenDB.expires_at < datetime.utcnow()
-    ).delete()
-    db.commit()
-    logger.info(f"Cleaned up {result} expired refresh tokens")
-    return result
-
-
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> UserDB:
-    """Get current user from JWT token."""
+    cutoff = int(time.time())
+    total = 0
+    while True:
+        batch_ids = (
+            select(RefreshTokenDB.id)
+            .where(RefreshTokenDB.expires_at < cutoff)
+            .limit(REFRESH_TOKEN_CLEANUP_BATCH_SIZE)
+        )
+        result = db.execute(
+            delete(RefreshTokenDB)
+            .where(RefreshTokenDB.id.in_(batch_ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount == 0:
+            break
+        total += result.rowcount
+    logger.info(f"Cleaned up {total} expired refresh tokens")
+    return total
+
+
+def user_token_claims(user: UserDB) -> dict:
+    """Access token claims; role/active/email let get_current_user skip the DB."""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "role": user.role,
+        "active": user.is_active,
+    }
+
+
+def _decode_credentials(credentials: HTTPAuthorizationCredentials) -> Tuple[dict, int]:
+    """Decode the bearer token and return (payload, user_id) or raise 401."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = credentials.credentials
-    payload = decode_token(token)
-
+    payload = decode_token(credentials.credentials)
     if payload is None:
         raise credentials_exception
 
@@ -199,16 +354,119 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    user = db.query(UserDB).filter(UserDB.id == int(user_id)).first()
-    if user is None:
-        raise credentials_exception
+    return payload, int(user_id)
+
 
-    if not user.is_active:
+def _ensure_active(is_active: bool) -> None:
+    if not is_active:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="User account is disabled"
         )
 
+
+def _lookup_cached_user(payload: dict, user_id: int) -> Optional[CachedUser]:
+    """User from the token claims, else from the in-process cache, else None."""
+    if "role" in payload and "active" in payload and "email" in payload:
+        return CachedUser(id=user_id, email=payload["email"], role=payload["role"], is_active=payload["active"])
+    with _user_cache_lock:
+        return _user_cache.get((user_id, payload.get("iat")))
+
+
+def _remember_user(payload: dict, user: Optional[UserDB]) -> CachedUser:
+    """Cache a user loaded from the database for this token, or raise 401 if missing."""
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    cached = CachedUser(id=user.id, email=user.email, role=user.role, is_active=user.is_active)
+    with _user_cache_lock:
+        _user_cache[(user.id, payload.get("iat"))] = cached
+    return cached
+
+
+def _user_from_cached(cached: CachedUser) -> UserDB:
+    """Detached UserDB with the cached columns, ready to merge(load=False)."""
+    user = UserDB(**cached._asdict())
+    make_transient_to_detached(user)
+    return user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserDB:
+    """
+    Get current user from JWT token.
+
+    Uses the role/active/email claims when present, then the user cache,
+    and only queries the database as a last resort. Claims are trusted
+    as issued, so deactivation or a role change takes effect at the next
+    token refresh, not on invalidate_user. The returned user is
+    attached to the session; columns not in the claims load lazily.
+    Endpoints that modify the user should use get_current_db_user.
+    """
+    payload, user_id = _decode_credentials(credentials)
+    cached = _lookup_cached_user(payload, user_id)
+
+    if cached is None:
+        user = db.execute(_SELECT_USER_BY_ID, {"uid": user_id}).scalar_one_or_none()
+        cached = _remember_user(payload, user)
+    else:
+        # Attach a persistent instance without a SELECT; any other column
+        # is loaded lazily on first access.
+        user = db.merge(_user_from_cached(cached), load=False)
+
+    _ensure_active(cached.is_active)
+
+    return user
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> UserDB:
+    """
+    get_current_user for routers that use get_async_db.
+
+    Shares the request's AsyncSession, so auth never checks out a second
+    pooled connection (and none at all when the token carries claims).
+    Only the claim columns are loaded; an AsyncSession cannot lazy-load the
+    rest, so endpoints needing other user columns should query them.
+    """
+    payload, user_id = _decode_credentials(credentials)
+    cached = _lookup_cached_user(payload, user_id)
+
+    if cached is None:
+        user = (await db.execute(_SELECT_USER_BY_ID, {"uid": user_id})).scalar_one_or_none()
+        cached = _remember_user(payload, user)
+    else:
+        user = await db.merge(_user_from_cached(cached), load=False)
+
+    _ensure_active(cached.is_active)
+
+    return user
+
+
+async def get_current_db_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> UserDB:
+    """Get current user freshly loaded from the database (for endpoints that modify it)."""
+    _, user_id = _decode_credentials(credentials)
+
+    user = db.execute(_SELECT_USER_BY_ID, {"uid": user_id}).scalar_one_or_none()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    _ensure_active(user.is_active)
+
     return user
 
 
@@ -227,8 +485,6 @@ async def validate_client_access(client_id: str, user: UserDB, db: Session) -> C
     Raises:
         HTTPException: 404 if client not found, 403 if access denied
     """
-    from .services.audit import log_action
-
     # Check if client exists
     client = db.query(ClientDB).filter(ClientDB.id == client_id).first()
 
@@ -2,10 +2,20 @@
 Database setup with SQLAlchemy
 Supports SQLite (dev) and PostgreSQL (production)
 """
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, JSON
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy import create_engine, event, exists, insert, delete, select, func, inspect, text, Column, Integer, BigInteger, String, Float, Boolean, DateTime, Text, ForeignKey, JSON, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from cachetools import TTLCache
+from sqlalchemy.orm import DeclarativeBase, sessionmaker, relationship, backref, deferred
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+from uuid import uuid4
+import base64
+import binascii
+import io
 import os
 import logging
 
@@ -23,21 +33,114 @@ if DATABASE_URL.startswith("sqlite"):
     os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
     engine = create_engine(
         DATABASE_URL,
-        connect_args={"check_same_thread": False}
+        connect_args={"check_same_thread": False, "timeout": 30},  # Wait on WAL writer locks instead of failing
+        query_cache_size=1200
     )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        """WAL lets readers run during writes; mmap serves reads from the page cache."""
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    async_engine = create_async_engine(
+        make_url(DATABASE_URL).set(drivername="sqlite+aiosqlite"),
+        connect_args={"timeout": 30}
+    )
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 else:
-    # PostgreSQL - no special connect_args needed
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_size=10)
+    # PostgreSQL. Pool sizes are per worker process; in production DATABASE_URL
+    # points at PgBouncer (pool_mode = transaction), which caps real backends.
+    connect_args = {}
+    statement_timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+    if statement_timeout_ms > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args=connect_args,
+        pool_pre_ping=True,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),  # Recycle before server/proxy idle timeouts
+        pool_timeout=5,  # Fail fast instead of queueing behind a saturated pool
+        pool_use_lifo=True,  # Reuse the most recently returned (warm) connection
+        query_cache_size=1200,
+        # psycopg2: multi-row VALUES for INSERT, execute_batch for UPDATE/DELETE executemany
+        executemany_mode="values_plus_batch",
+        insertmanyvalues_page_size=1000,
+        executemany_batch_page_size=500
+    )
+
+    # asyncpg engine for async routers. Its statement cache is disabled because
+    # PgBouncer in transaction mode can't keep prepared statements per client.
+    async_connect_args = {
+        "statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+    if statement_timeout_ms > 0:
+        async_connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+
+    async_engine = create_async_engine(
+        make_url(DATABASE_URL).set(drivername="postgresql+asyncpg"),
+        connect_args=async_connect_args,
+        pool_pre_ping=True,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "300")),
+        pool_timeout=5,
+        pool_use_lifo=True,
+        query_cache_size=1200
+    )
+
+
+
+class utcnow(FunctionElement):
+    """Current UTC timestamp evaluated by the database (naive, like datetime.utcnow)."""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _utcnow_default(element, compiler, **kw):
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+# JSONB on PostgreSQL (stored pre-parsed, GIN-indexable), plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), "postgresql")
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
-Base = declarative_base()
+class Base(DeclarativeBase):
+    pass
 
 
 # ==================== DATABASE MODELS ====================
 
 class ClientDB(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        # Partial: only active clients, the set the dropdowns and lists order by name
+        Index(
+            "ix_client_active_name", "name",
+            postgresql_where=text("is_active = true"),
+            sqlite_where=text("is_active = 1")
+        ),
+    )
 
     id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
@@ -45,38 +148,43 @@ class ClientDB(Base):
     meta_account_id = Column(String, nullable=True)
     color = Column(String, default="#6366f1")
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relationships
-    campaigns = relationship("CampaignDB", back_populates="client", cascade="all, delete-orphan")
-    metrics = relationship("MetricDB", back_populates="client", cascade="all, delete-orphan")
-    alerts = relationship("AlertDB", back_populates="client", cascade="all, delete-orphan")
-    config = relationship("ClientConfigDB", back_populates="client", uselist=False, cascade="all, delete-orphan")
+    campaigns = relationship("CampaignDB", back_populates="client", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
+    metrics = relationship("MetricDB", back_populates="client", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
+    alerts = relationship("AlertDB", back_populates="client", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
+    config = relationship("ClientConfigDB", back_populates="client", uselist=False, cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
 
 
 class CampaignDB(Base):
     __tablename__ = "campaigns"
 
     id = Column(String, primary_key=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False, index=True)
     name = Column(String, nullable=False)
     objective = Column(String, default="MESSAGES")
     status = Column(String, default="ACTIVE")
     daily_budget = Column(Float, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationships
-    client = relationship("ClientDB", back_populates="campaigns")
-    metrics = relationship("MetricDB", back_populates="campaign", cascade="all, delete-orphan")
+    client = relationship("ClientDB", back_populates="campaigns", lazy="raise_on_sql")
+    metrics = relationship("MetricDB", back_populates="campaign", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
 
 
 class MetricDB(Base):
     __tablename__ = "metrics"
+    __table_args__ = (
+        Index("ix_metric_client_date", "client_id", "date"),
+        Index("ix_metric_campaign_date", "campaign_id", "date"),
+        Index("ix_metric_client_ad_date", "client_id", "ad_id", "date"),  # Meta sync upsert lookup
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
-    campaign_id = Column(String, ForeignKey("campaigns.id"), nullable=True)
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    campaign_id = Column(String, ForeignKey("campaigns.id", ondelete="CASCADE"), nullable=True)
     date = Column(DateTime, nullable=False)
 
     # Campaign/Ad info
@@ -108,18 +216,47 @@ class MetricDB(Base):
     messaging_conversations = Column(Integer, nullable=True)
     leads = Column(Integer, nullable=True)
 
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationships
-    client = relationship("ClientDB", back_populates="metrics")
-    campaign = relationship("CampaignDB", back_populates="metrics")
+    client = relationship("ClientDB", back_populates="metrics", lazy="raise_on_sql")
+    campaign = relationship("CampaignDB", back_populates="metrics", lazy="raise_on_sql")
+
+
+class MetricDailySummaryDB(Base):
+    """Per-client daily totals of MetricDB, kept in sync by refresh_metric_daily_summary()."""
+    __tablename__ = "metric_daily_summary"
+    __table_args__ = (
+        Index("ix_metric_summary_date", "date"),  # all-brands period totals
+    )
+
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(DateTime, primary_key=True)
+
+    spend = Column(Float, default=0)
+    impressions = Column(BigInteger, default=0)
+    reach = Column(BigInteger, default=0)
+    clicks = Column(BigInteger, default=0)
+    results = Column(BigInteger, default=0)
+    purchase_value = Column(Float, default=0)
+
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
 
 class AlertDB(Base):
     __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alert_client_ack_created", "client_id", "acknowledged", "created_at"),
+        # Partial: the unacknowledged feed is a small slice of all alerts
+        Index(
+            "ix_alert_unacked", "client_id", "created_at",
+            postgresql_where=text("acknowledged = false"),
+            sqlite_where=text("acknowledged = 0")
+        ),
+    )
 
     id = Column(String, primary_key=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
     type = Column(String, nullable=False)  # ROAS_DROP, CPA_INCREASE, etc.
     severity = Column(String, default="INFO")  # INFO, WARNING, CRITICAL
     title = Column(String, nullable=False)
@@ -133,27 +270,30 @@ class AlertDB(Base):
     change_percent = Column(Float, nullable=True)
 
     acknowledged = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationships
-    client = relationship("ClientDB", back_populates="alerts")
+    client = relationship("ClientDB", back_populates="alerts", lazy="raise_on_sql")
 
 
 class ClientConfigDB(Base):
     __tablename__ = "client_configs"
+    __table_args__ = (
+        Index("ix_client_configs_thresholds", "thresholds", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    client_id = Column(String, ForeignKey("clients.id"), unique=True, nullable=False)
+    client_id = Column(String, ForeignKey("clients.id", ondelete="CASCADE"), unique=True, nullable=False)
     objective = Column(String, default="MESSAGES")
     currency = Column(String, default="ARS")
-    thresholds = Column(JSON, default={})
+    thresholds = Column(JSONType, default=dict)
     monthly_budget = Column(Float, default=0)
     result_value = Column(Float, default=100)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relationships
-    client = relationship("ClientDB", back_populates="config")
+    client = relationship("ClientDB", back_populates="config", lazy="raise_on_sql")
 
 
 class MetaTokenDB(Base):
@@ -165,39 +305,39 @@ class MetaTokenDB(Base):
     access_token = Column(Text, nullable=False)  # Encrypted in production
     ad_account_id = Column(String, nullable=True)  # Format: act_XXXXXXXXX
     user_id = Column(String, nullable=True)
-    scopes = Column(JSON, default=[])
+    scopes = Column(JSONType, default=list)
     expires_at = Column(DateTime, nullable=True)
     status = Column(String, default="valid")  # valid, expiring_soon, expired, invalid
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Relationship
-    client = relationship("ClientDB")
+    client = relationship("ClientDB", lazy="raise_on_sql")
 
 
 class LearningDB(Base):
     __tablename__ = "learnings"
 
     id = Column(String, primary_key=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(String, ForeignKey("clients.id"), nullable=False, index=True)
     type = Column(String, nullable=False)  # works, doesnt_work, insight
     text = Column(Text, nullable=False)
-    evidence = Column(Text, nullable=True)
+    evidence = deferred(Column(Text, nullable=True))
     category = Column(String, nullable=True)  # creative, audience, timing, budget
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 class ActionLogDB(Base):
     __tablename__ = "action_logs"
 
     id = Column(String, primary_key=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(String, ForeignKey("clients.id"), nullable=False, index=True)
     type = Column(String, nullable=False)
     description = Column(Text, nullable=False)
-    affected_items = Column(JSON, default=[])
+    affected_items = Column(JSONType, default=list)
     estimated_impact = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 class UserDB(Base):
@@ -205,54 +345,62 @@ class UserDB(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String, unique=True, nullable=False, index=True)
-    hashed_password = Column(String, nullable=False)
+    hashed_password = Column(String(128), nullable=False)  # argon2id (~97 chars) or legacy bcrypt (60)
     name = Column(String, nullable=False)
     role = Column(String, default="user")  # admin, user
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Two-Factor Authentication (2FA)
     totp_secret = Column(String, nullable=True)  # Encrypted TOTP secret
     is_2fa_enabled = Column(Boolean, default=False)
-    backup_codes = Column(JSON, default=[])  # List of hashed backup codes
+    backup_codes = Column(JSONType, default=list)  # List of hashed backup codes
 
     # Security fields for IP whitelisting and intrusion detection
-    allowed_ips = Column(JSON, default=[])  # List of allowed IP addresses/CIDR ranges
+    allowed_ips = Column(JSONType, default=list)  # List of allowed IP addresses/CIDR ranges
     last_login_ip = Column(String, nullable=True)
     failed_login_count = Column(Integer, default=0)
     locked_until = Column(DateTime, nullable=True)  # Account lockout timestamp
 
     # Relationships
-    refresh_tokens = relationship("RefreshTokenDB", back_populates="user", cascade="all, delete-orphan")
-    login_history = relationship("LoginHistoryDB", back_populates="user", cascade="all, delete-orphan")
-    security_alerts = relationship("SecurityAlertDB", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshTokenDB", back_populates="user", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
+    login_history = relationship("LoginHistoryDB", back_populates="user", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
+    security_alerts = relationship("SecurityAlertDB", back_populates="user", cascade="all, delete-orphan", passive_deletes=True, lazy="raise_on_sql")
 
 
 class RefreshTokenDB(Base):
     """Stores refresh tokens for JWT authentication."""
     __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index(
+            "ix_rt_user_active", "user_id",  # revoke_all_user_refresh_tokens
+            postgresql_where=text("is_revoked = false"),
+            sqlite_where=text("is_revoked = 0")
+        ),
+        Index("ix_rt_expires", "expires_at"),  # cleanup_expired_refresh_tokens
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    token_hash = Column(String, nullable=False, unique=True, index=True)
-    expires_at = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_hash = Column(LargeBinary(16), nullable=False, unique=True, index=True)  # BLAKE2b-128 digest
+    expires_at = Column(BigInteger, nullable=False)  # Unix epoch seconds
     is_revoked = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationship
-    user = relationship("UserDB", back_populates="refresh_tokens")
+    user = relationship("UserDB", back_populates="refresh_tokens", lazy="raise_on_sql")
 
 
 class SnapshotDB(Base):
     __tablename__ = "snapshots"
 
     id = Column(String, primary_key=True)
-    client_id = Column(String, ForeignKey("clients.id"), nullable=False)
+    client_id = Column(String, ForeignKey("clients.id"), nullable=False, index=True)
     period_start = Column(DateTime, nullable=False)
     period_end = Column(DateTime, nullable=False)
-    metrics_summary = Column(JSON, default={})
-    analysis_data = Column(JSON, default={})
-    created_at = Column(DateTime, default=datetime.utcnow)
+    metrics_summary = Column(JSONType, default=dict)
+    analysis_data = Column(JSONType, default=dict)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 class LoginHistoryDB(Base):
@@ -260,15 +408,15 @@ class LoginHistoryDB(Base):
     __tablename__ = "login_history"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     ip_address = Column(String, nullable=False)
     user_agent = Column(String, nullable=True)
     success = Column(Boolean, nullable=False)
     failure_reason = Column(String, nullable=True)  # e.g., "invalid_password", "account_locked", "ip_blocked"
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationship
-    user = relationship("UserDB", back_populates="login_history")
+    user = relationship("UserDB", back_populates="login_history", lazy="raise_on_sql")
 
 
 class SecurityAlertDB(Base):
@@ -276,38 +424,46 @@ class SecurityAlertDB(Base):
     __tablename__ = "security_alerts"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     alert_type = Column(String, nullable=False)  # e.g., "MULTIPLE_FAILED_LOGINS", "NEW_IP", "UNUSUAL_HOURS", "RAPID_REQUESTS"
     severity = Column(String, default="WARNING")  # INFO, WARNING, CRITICAL
     ip_address = Column(String, nullable=True)
-    details = Column(JSON, default={})
+    details = Column(JSONType, default=dict)
     acknowledged = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
     # Relationship
-    user = relationship("UserDB", back_populates="security_alerts")
+    user = relationship("UserDB", back_populates="security_alerts", lazy="raise_on_sql")
 
 
 class SessionDB(Base):
     """Stores active sessions with fingerprinting for security tracking."""
     __tablename__ = "sessions"
+    __table_args__ = (
+        # Partial: every session lookup filters is_active, revoked rows never need indexing
+        Index(
+            "ix_session_active_user_expires", "user_id", "expires_at",
+            postgresql_where=text("is_active = true"),
+            sqlite_where=text("is_active = 1")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    token_hash = Column(String, nullable=False, unique=True, index=True)
+    token_hash = Column(LargeBinary(32), nullable=False, unique=True, index=True)  # SHA-256 digest
     fingerprint_hash = Column(String, nullable=True, index=True)
-    fingerprint_data = Column(JSON, default={})  # Full fingerprint details
+    fingerprint_data = Column(JSONType, default=dict)  # Full fingerprint details
     ip_address = Column(String, nullable=False)
     user_agent = Column(String, nullable=True)
     is_active = Column(Boolean, default=True, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
     expires_at = Column(DateTime, nullable=False)
-    last_activity = Column(DateTime, default=datetime.utcnow)
+    last_activity = Column(DateTime, server_default=utcnow())
     revoked_at = Column(DateTime, nullable=True)
     revoke_reason = Column(String, nullable=True)  # e.g., "user_requested", "password_changed", "max_sessions_exceeded"
 
     # Relationship
-    user = relationship("UserDB", backref="sessions")
+    user = relationship("UserDB", backref=backref("sessions", lazy="raise_on_sql"), lazy="raise_on_sql")
 
 
 class WebAuthnCredentialDB(Base):
@@ -316,22 +472,25 @@ class WebAuthnCredentialDB(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    credential_id = Column(String, nullable=False, unique=True, index=True)  # Base64 encoded
-    public_key = Column(Text, nullable=False)  # Base64 encoded public key
+    credential_id = Column(LargeBinary, nullable=False, unique=True, index=True)  # Raw credential ID bytes
+    public_key = deferred(Column(Text, nullable=False))  # Base64 encoded public key; not needed for listing
     sign_count = Column(Integer, default=0)
     device_name = Column(String, nullable=True)  # User-friendly name like "YubiKey 5"
-    transports = Column(JSON, default=[])  # USB, NFC, BLE, internal
-    created_at = Column(DateTime, default=datetime.utcnow)
+    transports = Column(JSONType, default=list)  # USB, NFC, BLE, internal
+    created_at = Column(DateTime, server_default=utcnow())
     last_used = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True)
 
     # Relationship
-    user = relationship("UserDB", backref="webauthn_credentials")
+    user = relationship("UserDB", backref=backref("webauthn_credentials", lazy="raise_on_sql"), lazy="raise_on_sql")
 
 
 class CreativeDB(Base):
     """Stores creative assets with analyzed attributes for comparison."""
     __tablename__ = "creatives"
+    __table_args__ = (
+        Index("ix_creative_category_ctr", "product_category", "ctr"),  # top performers by category
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     client_id = Column(String, ForeignKey("clients.id"), nullable=False, index=True)
@@ -421,11 +580,11 @@ class CreativeDB(Base):
     # ==================== METADATA ====================
     analysis_version = Column(String, default="1.0")
     analyzed_at = Column(DateTime, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
+    updated_at = Column(DateTime, server_default=utcnow(), onupdate=utcnow())
 
     # Raw JSON for additional attributes
-    extra_attributes = Column(JSON, default={})
+    extra_attributes = deferred(Column(JSONType, default=dict))
 
 
 class CSPViolationDB(Base):
@@ -439,11 +598,11 @@ class CSPViolationDB(Base):
     source_file = Column(String, nullable=True)
     line_number = Column(Integer, nullable=True)
     column_number = Column(Integer, nullable=True)
-    original_policy = Column(Text, nullable=True)
+    original_policy = deferred(Column(Text, nullable=True))  # Full policy text, only for forensics
     disposition = Column(String, nullable=True)  # "enforce" or "report"
     user_agent = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, server_default=utcnow())
 
 
 # ==================== DATABASE DEPENDENCY ====================
@@ -457,36 +616,304 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency to get an async database session (handlers await queries instead of blocking the loop)."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def get_db_connection():
-    """Get raw database connection for direct SQL queries."""
-    if DATABASE_URL.startswith("sqlite"):
-        import sqlite3
-        return sqlite3.connect(DATABASE_URL.replace("sqlite:///", ""))
-    else:
-        import psycopg2
-        return psycopg2.connect(DATABASE_URL)
+    """
+    Get raw DBAPI connection for direct SQL queries.
+
+    Checked out from the engine's pool; close() returns it to the pool
+    (rolling back any open transaction) instead of closing the socket.
+    """
+    return engine.raw_connection()
+
+
+def _decode_base64url(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _naive_utc_text_to_epoch(value: str) -> int:
+    return int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp())
+
+
+# Columns whose type changed after tables were already deployed. create_all
+# never alters existing tables, so init_db converts them in place:
+# (table, column, SQLite value decoder, PostgreSQL type, PostgreSQL USING expression)
+_LEGACY_COLUMNS = (
+    ("refresh_tokens", "token_hash", bytes.fromhex,  # hex SHA-256
+     "bytea", "decode(token_hash, 'hex')"),
+    ("refresh_tokens", "expires_at", _naive_utc_text_to_epoch,  # naive UTC datetime
+     "bigint", "extract(epoch from expires_at)::bigint"),
+    ("sessions", "token_hash", bytes.fromhex,  # hex SHA-256
+     "bytea", "decode(token_hash, 'hex')"),
+    ("webauthn_credentials", "credential_id", _decode_base64url,  # base64url id
+     "bytea", "decode(rpad(translate(credential_id, '-_', '+/'), (length(credential_id) + 3) / 4 * 4, '='), 'base64')"),
+)
+
+
+def _convert_legacy_sqlite_columns(conn) -> int:
+    """
+    Rewrite old text values on SQLite; returns the number of rows converted.
+
+    SQLite keeps the old declared type but stores any value in any column,
+    so only rows still holding text need decoding.
+    """
+    converted = 0
+    for table, column, decode, _, _ in _LEGACY_COLUMNS:
+        rows = conn.execute(text(
+            f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'text'"
+        )).all()
+        for row_id, value in rows:
+            try:
+                new_value = decode(value)
+            except (ValueError, binascii.Error):
+                logger.warning(f"Could not convert {table}.{column} for id {row_id}; left as text")
+                continue
+            conn.execute(text(f"UPDATE {table} SET {column} = :v WHERE id = :id"), {"v": new_value, "id": row_id})
+            converted += 1
+    return converted
+
+
+def _convert_legacy_postgresql_columns(conn) -> int:
+    """ALTER columns still on their old type on PostgreSQL; returns the number of columns altered."""
+    converted = 0
+    for table, column, _, pg_type, using in _LEGACY_COLUMNS:
+        data_type = conn.execute(text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :t AND column_name = :c"
+        ), {"t": table, "c": column}).scalar()
+        if data_type is not None and data_type != pg_type:
+            conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE {pg_type} USING {using}"))
+            logger.info(f"Converted {table}.{column} from {data_type} to {pg_type}")
+            converted += 1
+    return converted
 
 
 def init_db():
     """Initialize database tables."""
     logger.info(f"Initializing database: {DATABASE_URL.split('@')[-1] if '@' in DATABASE_URL else DATABASE_URL}")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
+
+    # One catalog query instead of create_all's per-table existence checks, and all
+    # DDL on one connection/transaction (atomic on PostgreSQL)
+    with engine.begin() as conn:
+        existing_tables = set(inspect(conn).get_table_names())
+        missing_tables = [t for t in Base.metadata.sorted_tables if t.name not in existing_tables]
+        if missing_tables:
+            Base.metadata.create_all(bind=conn, tables=missing_tables, checkfirst=False)
+        converted = 0
+        if conn.dialect.name == "sqlite":
+            converted = _convert_legacy_sqlite_columns(conn)
+        elif conn.dialect.name == "postgresql":
+            converted = _convert_legacy_postgresql_columns(conn)
+    if converted:
+        logger.info(f"Converted {converted} legacy column value(s)/type(s)")
+    if missing_tables:
+        logger.info(f"Created tables: {', '.join(t.name for t in missing_tables)}")
+    else:
+        logger.info("Database schema up to date")
+
+    # One-time backfill when the summary table is introduced on an existing database
+    db = SessionLocal()
+    try:
+        if (
+            not db.query(exists().where(MetricDailySummaryDB.client_id.isnot(None))).scalar()
+            and db.query(exists().where(MetricDB.id.isnot(None))).scalar()
+        ):
+            rows = refresh_metric_daily_summary(db)
+            db.commit()
+            logger.info(f"Backfilled metric_daily_summary with {rows} rows")
+    finally:
+        db.close()
+
+
+# Short-lived cache for dashboard aggregates, keyed by the request's filters.
+# Cleared whenever metrics are ingested; the TTL bounds staleness across processes.
+metrics_cache: TTLCache = TTLCache(maxsize=256, ttl=60)
+
+
+def invalidate_metrics_cache():
+    """Drop cached metric aggregates after new metrics are committed."""
+    metrics_cache.clear()
+
+
+class MetaCredentials(NamedTuple):
+    """Detached copy of the fields Meta API calls need from MetaTokenDB."""
+    access_token: str
+    ad_account_id: Optional[str]
+
+
+# Per-client Meta credentials, read by every Meta action endpoint but rarely written.
+# The MetaTokenDB mapper events below only see ORM flushes in this process. A token
+# rotated by another worker, by a script (scripts/sync_meta.py) or through a Core
+# update() is picked up once the entry expires, so the TTL is kept short; in-process
+# Core writers should call invalidate_meta_token_cache() after committing.
+META_TOKEN_CACHE_TTL_SECONDS = 10
+meta_token_cache: TTLCache = TTLCache(maxsize=1024, ttl=META_TOKEN_CACHE_TTL_SECONDS)
+
+
+def invalidate_meta_token_cache(client_id: Optional[str] = None):
+    """Drop cached Meta credentials for one client, or for all clients."""
+    if client_id is None:
+        meta_token_cache.clear()
+    else:
+        meta_token_cache.pop(client_id, None)
+
+
+def get_meta_credentials(db, client_id: str) -> Optional[MetaCredentials]:
+    """Return the client's Meta credentials, or None if no token is stored."""
+    if client_id in meta_token_cache:
+        return meta_token_cache[client_id]
+
+    row = db.execute(
+        select(MetaTokenDB.access_token, MetaTokenDB.ad_account_id)
+        .where(MetaTokenDB.client_id == client_id)
+    ).first()
+    credentials = MetaCredentials(row.access_token, row.ad_account_id) if row else None
+    meta_token_cache[client_id] = credentials
+    return credentials
+
+
+@event.listens_for(MetaTokenDB, "after_insert")
+@event.listens_for(MetaTokenDB, "after_update")
+@event.listens_for(MetaTokenDB, "after_delete")
+def _invalidate_meta_token_cache(mapper, connection, target):
+    invalidate_meta_token_cache(target.client_id)
+
+
+def refresh_metric_daily_summary(
+    db,
+    client_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> int:
+    """
+    Recompute MetricDailySummaryDB rows from MetricDB for [start, end).
+
+    Without arguments every client and date is rebuilt. Runs inside the
+    session's transaction; the caller commits.
+    """
+    db.flush()  # Sessions don't autoflush; pending MetricDB updates must be visible here
+
+    conditions = []
+    if client_id:
+        conditions.append(MetricDB.client_id == client_id)
+    if start:
+        conditions.append(MetricDB.date >= start)
+    if end:
+        conditions.append(MetricDB.date < end)
+
+    summary_conditions = []
+    if client_id:
+        summary_conditions.append(MetricDailySummaryDB.client_id == client_id)
+    if start:
+        summary_conditions.append(MetricDailySummaryDB.date >= start)
+    if end:
+        summary_conditions.append(MetricDailySummaryDB.date < end)
+
+    totals = (
+        select(
+            MetricDB.client_id,
+            MetricDB.date,
+            func.coalesce(func.sum(MetricDB.spend), 0),
+            func.coalesce(func.sum(MetricDB.impressions), 0),
+            func.coalesce(func.sum(MetricDB.reach), 0),
+            func.coalesce(func.sum(MetricDB.clicks), 0),
+            func.coalesce(func.sum(MetricDB.results), 0),
+            func.coalesce(func.sum(MetricDB.purchase_value), 0),
+        )
+        .where(*conditions)
+        .group_by(MetricDB.client_id, MetricDB.date)
+    )
+
+    db.execute(delete(MetricDailySummaryDB).where(*summary_conditions))
+    result = db.execute(
+        insert(MetricDailySummaryDB).from_select(
+            ["client_id", "date", "spend", "impressions", "reach", "clicks", "results", "purchase_value"],
+            totals
+        )
+    )
+    return result.rowcount
+
+
+def _insert_ignoring_conflicts(model):
+    """Bulk INSERT that skips rows whose primary key already exists."""
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
+
+def _copy_value(value) -> str:
+    """Format one value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def bulk_copy_metrics(db, rows: List[dict]) -> int:
+    """
+    Insert many MetricDB rows in one go.
+
+    On psycopg2 the rows are streamed with COPY, which skips per-row parse and
+    plan work; other backends fall back to a bulk INSERT. All rows must share
+    the same keys. Runs inside the session's transaction; the caller commits.
+    """
+    if not rows:
+        return 0
+
+    if db.get_bind().dialect.driver == "psycopg2":
+        # COPY bypasses SQLAlchemy, so fill Python-side column defaults ourselves
+        defaults = {
+            column.name: column.default.arg
+            for column in MetricDB.__table__.columns
+            if column.default is not None and column.default.is_scalar
+        }
+        columns = list(dict.fromkeys([*rows[0].keys(), *defaults]))
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(_copy_value(row.get(c, defaults.get(c))) for c in columns) + "\n")
+        buffer.seek(0)
+
+        dbapi_connection = db.connection().connection.dbapi_connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {MetricDB.__tablename__} ({', '.join(columns)}) FROM STDIN",
+                buffer
+            )
+    else:
+        db.execute(insert(MetricDB), rows)
+
+    return len(rows)
 
 
 def seed_demo_data():
     """Seed database with demo data if empty."""
     db = SessionLocal()
     try:
-        # Check if clients exist
-        existing_clients = db.query(ClientDB).count()
-        if existing_clients > 0:
-            logger.info(f"Database already has {existing_clients} clients, skipping seed")
+        # Check if clients exist (EXISTS stops at the first row, COUNT scans them all)
+        already_seeded = db.query(exists().where(ClientDB.id.isnot(None))).scalar()
+        if already_seeded:
+            logger.info("Database already has clients, skipping seed")
             return
 
         # Demo clients
-        demo_clients = [
-            ClientDB(
+        client_rows = [
+            dict(
                 id="client-1",
                 name="Restaurante La Parrilla",
                 industry="Gastronomia",
@@ -494,7 +921,7 @@ def seed_demo_data():
                 color="#10b981",
                 is_active=True
             ),
-            ClientDB(
+            dict(
                 id="client-2",
                 name="Inmobiliaria del Sur",
                 industry="Real Estate",
@@ -502,7 +929,7 @@ def seed_demo_data():
                 color="#6366f1",
                 is_active=True
             ),
-            ClientDB(
+            dict(
                 id="client-3",
                 name="Gimnasio PowerFit",
                 industry="Fitness",
@@ -510,7 +937,7 @@ def seed_demo_data():
                 color="#f59e0b",
                 is_active=True
             ),
-            ClientDB(
+            dict(
                 id="client-4",
                 name="Tienda TechStore",
                 industry="Retail",
@@ -518,7 +945,7 @@ def seed_demo_data():
                 color="#ef4444",
                 is_active=True
             ),
-            ClientDB(
+            dict(
                 id="client-5",
                 name="Clinica Dental Sonrisas",
                 industry="Salud",
@@ -526,7 +953,7 @@ def seed_demo_data():
                 color="#8b5cf6",
                 is_active=True
             ),
-            ClientDB(
+            dict(
                 id="client-6",
                 name="Academia de Idiomas",
                 industry="Educacion",
@@ -536,13 +963,11 @@ def seed_demo_data():
             ),
         ]
 
-        for client in demo_clients:
-            db.add(client)
+        db.execute(_insert_ignoring_conflicts(ClientDB), client_rows)
 
         # Demo alerts
-        from uuid import uuid4
-        demo_alerts = [
-            AlertDB(
+        alert_rows = [
+            dict(
                 id=str(uuid4()),
                 client_id="client-1",
                 type="FATIGUE_DETECTED",
@@ -555,7 +980,7 @@ def seed_demo_data():
                 current_value=4.2,
                 acknowledged=False
             ),
-            AlertDB(
+            dict(
                 id=str(uuid4()),
                 client_id="client-1",
                 type="CPA_INCREASE",
@@ -570,7 +995,7 @@ def seed_demo_data():
                 change_percent=60,
                 acknowledged=False
             ),
-            AlertDB(
+            dict(
                 id=str(uuid4()),
                 client_id="client-2",
                 type="NEW_WINNER",
@@ -583,8 +1008,16 @@ def seed_demo_data():
             ),
         ]
 
-        for alert in demo_alerts:
-            db.add(alert)
+        # Same keys on every row plus render_nulls lets the ORM send the batch as
+        # one executemany instead of one statement per distinct key set
+        alert_columns = {key for row in alert_rows for key in row}
+        alert_rows = [{key: row.get(key) for key in alert_columns} for row in alert_rows]
+
+        db.execute(
+            _insert_ignoring_conflicts(AlertDB),
+            alert_rows,
+            execution_options={"render_nulls": True}
+        )
 
         db.commit()
         logger.info("Demo data seeded successfully!")
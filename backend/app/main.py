@@ -2,19 +2,25 @@
 Emiti Metrics - Backend API
 Analisis automatico de campanas de Meta Ads
 """
+import asyncio
 import os
-import json
 import logging
+import logging.handlers
+import queue
+import ssl
+import sys
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
+import orjson
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from contextlib import asynccontextmanager
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
+from sqlalchemy import desc, insert
 
 # Sentry for error tracking
 import sentry_sdk
@@ -22,7 +28,8 @@ from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 
 from .routers import campaigns, analysis, upload, alerts, advanced, clients, ai, auth, rules, meta, crm, creative
-from .database import init_db, seed_demo_data
+from .database import init_db, seed_demo_data, SessionLocal, CSPViolationDB
+from .services.security import get_client_ip, get_rate_limit_key
 
 
 # ============================================================================
@@ -32,7 +39,8 @@ class JSONFormatter(logging.Formatter):
     """Format logs as JSON for better observability."""
     def format(self, record):
         log_obj = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            # orjson serializes datetimes natively; use the record's own timestamp
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -44,7 +52,7 @@ class JSONFormatter(logging.Formatter):
             log_obj["exception"] = self.formatException(record.exc_info)
         if hasattr(record, "request_id"):
             log_obj["request_id"] = record.request_id
-        return json.dumps(log_obj)
+        return orjson.dumps(log_obj, option=orjson.OPT_UTC_Z).decode()
 
 
 # Environment
@@ -67,93 +75,195 @@ if SENTRY_DSN and IS_PRODUCTION:
         send_default_pii=False,  # Don't send personal data
     )
 
-# Configure structured logging
+LOG_QUEUE_MAXSIZE = 10_000
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # In-process queue: pass the record through unformatted so the listener's
+        # formatter (e.g. JSONFormatter) still sees exc_info
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Not via logging: the root logger is itself queued
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                sys.stderr.write(f"Log queue full, dropped {self.dropped} record(s) so far\n")
+
+
+# Configure structured logging. Request paths only enqueue records; formatting
+# and the stream write happen on a QueueListener thread started in the lifespan.
 handler = logging.StreamHandler()
 if IS_PRODUCTION:
     handler.setFormatter(JSONFormatter())
 else:
     handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
 
-logging.basicConfig(level=logging.INFO, handlers=[handler])
+log_queue = queue.Queue(maxsize=LOG_QUEUE_MAXSIZE)
+logging.basicConfig(level=logging.INFO, handlers=[DroppingQueueHandler(log_queue)])
+log_listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
 logger = logging.getLogger(__name__)
 
 
 # ============================================================================
 # AUDIT LOGGING CONFIGURATION
 # ============================================================================
+AUDIT_QUEUE_MAXSIZE = 10_000
+
+
+class AuditJSONFormatter(logging.Formatter):
+    """Format audit records as JSON lines; messages with quotes or newlines stay valid JSON."""
+    def format(self, record):
+        return orjson.dumps({
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }, option=orjson.OPT_UTC_Z).decode()
+
+
+class BatchFlushFileHandler(logging.FileHandler):
+    """
+    File handler that flushes only once the audit queue is drained.
+
+    FileHandler flushes (one write() syscall) after every record. Here records
+    accumulate in the file's buffer while the QueueListener has a backlog and
+    reach disk together; an idle queue still flushes each record immediately.
+    """
+
+    def __init__(self, filename, pending: queue.Queue):
+        super().__init__(filename)
+        self.pending = pending
+
+    def flush(self):
+        if self.pending.empty():
+            super().flush()
+
+
+class AuditQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler for audit records, which must never be dropped.
+
+    When the queue is full the record is written synchronously by the
+    listener's handlers in the calling thread instead of being discarded.
+    """
+
+    def __init__(self, pending: queue.Queue, handlers):
+        super().__init__(pending)
+        self.handlers = handlers
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            for audit_handler in self.handlers:
+                if record.levelno >= audit_handler.level:
+                    audit_handler.handle(record)
+
+
 def configure_audit_logger():
-    """Configure dedicated audit logger for security-relevant actions."""
+    """
+    Configure dedicated audit logger for security-relevant actions.
+
+    Records are enqueued on the request path and written by a background
+    QueueListener thread, started and stopped in the app lifespan.
+    """
     audit_logger = logging.getLogger("audit")
     audit_logger.setLevel(logging.INFO)
     audit_logger.propagate = False  # Don't propagate to root logger
+    audit_queue = queue.Queue(maxsize=AUDIT_QUEUE_MAXSIZE)
+    handlers = []
 
     # Audit log formatter - always structured for parsing
-    audit_formatter = logging.Formatter(
-        '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s"}'
-    )
+    audit_formatter = AuditJSONFormatter()
 
     # Console handler for development
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(audit_formatter if IS_PRODUCTION else logging.Formatter(
         "%(asctime)s - AUDIT - %(levelname)s - %(message)s"
     ))
-    audit_logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # File handler for production
     if IS_PRODUCTION:
         try:
             # Try production log path
             audit_log_path = os.getenv("AUDIT_LOG_PATH", "/var/log/emiti-metrics-audit.log")
-            file_handler = logging.FileHandler(audit_log_path)
+            file_handler = BatchFlushFileHandler(audit_log_path, audit_queue)
             file_handler.setFormatter(audit_formatter)
-            audit_logger.addHandler(file_handler)
+            handlers.append(file_handler)
             logger.info(f"Audit logging configured to: {audit_log_path}")
         except (PermissionError, OSError) as e:
             # Fallback to local data directory
             fallback_path = "./data/audit.log"
             os.makedirs("./data", exist_ok=True)
-            file_handler = logging.FileHandler(fallback_path)
+            file_handler = BatchFlushFileHandler(fallback_path, audit_queue)
             file_handler.setFormatter(audit_formatter)
-            audit_logger.addHandler(file_handler)
+            handlers.append(file_handler)
             logger.warning(f"Could not write to production audit log, using fallback: {fallback_path} ({e})")
     else:
         # Development - also write to local file for testing
         os.makedirs("./data", exist_ok=True)
-        file_handler = logging.FileHandler("./data/audit.log")
+        file_handler = BatchFlushFileHandler("./data/audit.log", audit_queue)
         file_handler.setFormatter(logging.Formatter(
             "%(asctime)s - %(levelname)s - %(message)s"
         ))
-        audit_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    audit_logger.addHandler(AuditQueueHandler(audit_queue, handlers))
+    listener = logging.handlers.QueueListener(audit_queue, *handlers, respect_handler_level=True)
 
-    return audit_logger
+    return audit_logger, listener
 
 
 # Initialize audit logger
-audit_logger = configure_audit_logger()
+audit_logger, audit_listener = configure_audit_logger()
 
 
 # ============================================================================
 # RATE LIMITING - Per-user when authenticated, per-IP otherwise
 # ============================================================================
-def get_rate_limit_key(request: Request) -> str:
-    """Get rate limit key - user_id if authenticated, otherwise IP."""
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        return f"user:{auth_header[:50]}"
-    return get_remote_address(request)
-
 limiter = Limiter(key_func=get_rate_limit_key)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database on startup."""
+    log_listener.start()
     logger.info("Starting Emiti Metrics API...")
-    init_db()
-    seed_demo_data()
+    audit_listener.start()
+    logger.info(f"Crypto backend: {ssl.OPENSSL_VERSION}")
+    app.state.ready = False
+    # Blocking DB work runs in a worker thread so the event loop stays free
+    await asyncio.to_thread(init_db)
+
+    async def seed_then_ready():
+        await asyncio.to_thread(seed_demo_data)
+        app.state.ready = True
+        logger.info("Demo data ready")
+
+    seed_task = asyncio.create_task(seed_then_ready())
+    csp_flush_task = asyncio.create_task(csp_report_flusher())
     logger.info("Emiti Metrics API started successfully")
     yield
     logger.info("Shutting down Emiti Metrics API...")
+    if not seed_task.done():
+        seed_task.cancel()
+    csp_flush_task.cancel()
+    await asyncio.to_thread(flush_csp_reports)
+    audit_listener.stop()
+    for audit_handler in audit_listener.handlers:
+        audit_handler.flush()
+    log_listener.stop()
 
 
 # Disable docs in production
@@ -177,85 +287,84 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 
 # ============================================================================
-# SECURITY HEADERS MIDDLEWARE
+# SECURITY HEADERS (applied by SecurityAndAccessLogMiddleware)
 # ============================================================================
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Add security headers to all responses."""
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-
-        # Core security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-
-        # Restrictive Permissions-Policy
-        response.headers["Permissions-Policy"] = (
-            "accelerometer=(), "
-            "ambient-light-sensor=(), "
-            "autoplay=(), "
-            "battery=(), "
-            "camera=(), "
-            "cross-origin-isolated=(), "
-            "display-capture=(), "
-            "document-domain=(), "
-            "encrypted-media=(), "
-            "execution-while-not-rendered=(), "
-            "execution-while-out-of-viewport=(), "
-            "fullscreen=(), "
-            "geolocation=(), "
-            "gyroscope=(), "
-            "keyboard-map=(), "
-            "magnetometer=(), "
-            "microphone=(), "
-            "midi=(), "
-            "navigation-override=(), "
-            "payment=(), "
-            "picture-in-picture=(), "
-            "publickey-credentials-get=(), "
-            "screen-wake-lock=(), "
-            "sync-xhr=(), "
-            "usb=(), "
-            "web-share=(), "
-            "xr-spatial-tracking=()"
-        )
-
-        # Cross-Origin policies
-        response.headers["X-Permitted-Cross-Domain-Policies"] = "none"
-        response.headers["Cross-Origin-Embedder-Policy"] = "require-corp"
-        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
-        response.headers["Cross-Origin-Resource-Policy"] = "same-origin"
-
-        # HSTS only in production
-        if IS_PRODUCTION:
-            response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
-
-        # Content Security Policy - Hardened (no unsafe-inline for scripts)
-        csp_directives = [
-            "default-src 'self'",
-            "script-src 'self'",  # No unsafe-inline - scripts must be from same origin
-            "style-src 'self' 'unsafe-inline'",  # Keep unsafe-inline for styles (needed for inline styles)
-            "img-src 'self' data: https:",
-            "font-src 'self' https://fonts.gstatic.com",
-            "connect-src 'self' https://graph.facebook.com https://api.emiti.cloud",
-            "frame-ancestors 'none'",
-            "base-uri 'self'",
-            "form-action 'self'",
-            "object-src 'none'",
-            "upgrade-insecure-requests",
-            "block-all-mixed-content",
-            "report-uri /api/csp-report",  # Report CSP violations
-        ]
-        response.headers["Content-Security-Policy"] = "; ".join(csp_directives)
-        # Also use Report-To header (modern browsers)
-        response.headers["Report-To"] = '{"group":"csp-endpoint","max_age":31536000,"endpoints":[{"url":"/api/csp-report"}]}'
+# Security headers are static for the process lifetime (IS_PRODUCTION is read at
+# import), so they are encoded once and appended to each response as raw bytes.
+PERMISSIONS_POLICY = ", ".join(f"{feature}=()" for feature in (
+    "accelerometer",
+    "ambient-light-sensor",
+    "autoplay",
+    "battery",
+    "camera",
+    "cross-origin-isolated",
+    "display-capture",
+    "document-domain",
+    "encrypted-media",
+    "execution-while-not-rendered",
+    "execution-while-out-of-viewport",
+    "fullscreen",
+    "geolocation",
+    "gyroscope",
+    "keyboard-map",
+    "magnetometer",
+    "microphone",
+    "midi",
+    "navigation-override",
+    "payment",
+    "picture-in-picture",
+    "publickey-credentials-get",
+    "screen-wake-lock",
+    "sync-xhr",
+    "usb",
+    "web-share",
+    "xr-spatial-tracking",
+))
+
+# Content Security Policy - Hardened (no unsafe-inline for scripts)
+CSP_DIRECTIVES = (
+    "default-src 'self'",
+    "script-src 'self'",  # No unsafe-inline - scripts must be from same origin
+    "style-src 'self' 'unsafe-inline'",  # Keep unsafe-inline for styles (needed for inline styles)
+    "img-src 'self' data: https:",
+    "font-src 'self' https://fonts.gstatic.com",
+    "connect-src 'self' https://graph.facebook.com https://api.emiti.cloud",
+    "frame-ancestors 'none'",
+    "base-uri 'self'",
+    "form-action 'self'",
+    "object-src 'none'",
+    "upgrade-insecure-requests",
+    "block-all-mixed-content",
+    "report-uri /api/csp-report",  # Report CSP violations
+)
 
-        return response
+SECURITY_HEADERS = {
+    # Core security headers
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    # Restrictive Permissions-Policy
+    "Permissions-Policy": PERMISSIONS_POLICY,
+    # Cross-Origin policies
+    "X-Permitted-Cross-Domain-Policies": "none",
+    "Cross-Origin-Embedder-Policy": "require-corp",
+    "Cross-Origin-Opener-Policy": "same-origin",
+    "Cross-Origin-Resource-Policy": "same-origin",
+    "Content-Security-Policy": "; ".join(CSP_DIRECTIVES),
+    # Also use Report-To header (modern browsers)
+    "Report-To": '{"group":"csp-endpoint","max_age":31536000,"endpoints":[{"url":"/api/csp-report"}]}',
+}
+
+# HSTS only in production
+if IS_PRODUCTION:
+    SECURITY_HEADERS["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains; preload"
 
+SECURITY_HEADERS_RAW = tuple(
+    (name.lower().encode("latin-1"), value.encode("latin-1"))
+    for name, value in SECURITY_HEADERS.items()
+)
 
-app.add_middleware(SecurityHeadersMiddleware)
 
 # ============================================================================
 # CORS CONFIGURATION - Environment-aware
@@ -290,7 +399,7 @@ logger.info(f"CORS allowed origins: {allowed_origins}")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=allowed_origins,
+    allow_origins=frozenset(allowed_origins),  # O(1) origin membership check per request
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "Accept", "X-Request-ID", "X-CRM-API-Key"],
@@ -298,35 +407,85 @@ app.add_middleware(
 
 
 # ============================================================================
-# REQUEST LOGGING MIDDLEWARE
+# SECURITY HEADERS + REQUEST LOGGING MIDDLEWARE
 # ============================================================================
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log all requests with timing and status."""
-    import uuid
-    request_id = str(uuid.uuid4())[:8]
-    start_time = time.time()
-
-    response = await call_next(request)
+# Probe and landing hits are logged at DEBUG so they don't flood the INFO log
+QUIET_LOG_PATHS = frozenset({"/", "/health", "/health/ready"})
 
-    duration_ms = (time.time() - start_time) * 1000
 
-    log_data = {
+def _access_log_json(scope: Scope, request_id: str, status_code: int, duration_us: int) -> str:
+    client = scope.get("client")
+    return orjson.dumps({
         "request_id": request_id,
-        "method": request.method,
-        "path": request.url.path,
-        "status": response.status_code,
-        "duration_ms": round(duration_ms, 2),
-        "client_ip": request.client.host if request.client else "unknown",
-    }
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status_code,
+        "duration_us": duration_us,
+        "client_ip": client[0] if client else "unknown",
+    }).decode()
 
-    if IS_PRODUCTION:
-        logger.info(json.dumps(log_data))
-    else:
-        logger.info(f"{request.method} {request.url.path} - {response.status_code} ({duration_ms:.0f}ms)")
 
-    response.headers["X-Request-ID"] = request_id
-    return response
+def _access_log_text(scope: Scope, request_id: str, status_code: int, duration_us: int) -> str:
+    return f"{scope['method']} {scope['path']} - {status_code} ({duration_us // 1000}ms)"
+
+
+# Chosen once at import, like the HSTS header, instead of branching per request
+format_access_log = _access_log_json if IS_PRODUCTION else _access_log_text
+
+
+class SecurityAndAccessLogMiddleware:
+    """
+    Add security headers and X-Request-ID to responses, and log every request
+    with timing and status.
+
+    Pure ASGI: only http.response.start is touched (one header pass), avoiding
+    the task group and stream bridge BaseHTTPMiddleware puts around every
+    request, and the body is never buffered.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = os.urandom(4).hex()
+        start_ns = time.perf_counter_ns()
+        status_code = 0
+        # Security headers are meaningless on OPTIONS (incl. CORS preflights) and on
+        # the empty 204s returned to browsers' CSP reports
+        extra_headers = (
+            ()
+            if scope["method"] == "OPTIONS" or scope["path"] == "/api/csp-report"
+            else SECURITY_HEADERS_RAW
+        )
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # No route sets these headers, so append without a per-key scan
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    *extra_headers,
+                    (b"x-request-id", request_id.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+        path = scope["path"]
+        level = logging.DEBUG if path in QUIET_LOG_PATHS else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+
+        duration_us = (time.perf_counter_ns() - start_ns) // 1000
+        logger.log(level, format_access_log(scope, request_id, status_code, duration_us))
+
+
+app.add_middleware(SecurityAndAccessLogMiddleware)
 
 
 # Routers
@@ -354,16 +513,62 @@ async def root():
     }
 
 
+# Built once; the body never changes and skips FastAPI's JSON encoding per probe.
+# The middleware copies the header list rather than mutating it, so reuse is safe.
+HEALTH_RESPONSE = Response(content=b'{"status":"healthy"}', media_type="application/json")
+
+
+# Probes are not rate limited; several load balancers polling from one IP exceed 60/minute
 @app.get("/health")
-@limiter.limit("60/minute")
-async def health_check(request: Request):
-    return {"status": "healthy"}
+async def health_check():
+    return HEALTH_RESPONSE
+
+
+@app.get("/health/ready")
+async def readiness_check(request: Request):
+    """Readiness probe: 503 until startup DB init and demo seeding finish."""
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
 
 
 # ============================================================================
 # CSP VIOLATION REPORTING
 # ============================================================================
 
+# Reports are buffered and written in batches; a misconfigured page can make
+# browsers fire dozens per second. Oldest reports are dropped past maxlen.
+CSP_FLUSH_INTERVAL_SECONDS = 2
+csp_report_buffer: deque = deque(maxlen=10000)
+
+
+def flush_csp_reports() -> int:
+    """Insert all buffered CSP reports in one executemany batch."""
+    batch = []
+    while csp_report_buffer:
+        batch.append(csp_report_buffer.popleft())
+    if not batch:
+        return 0
+
+    db = SessionLocal()
+    try:
+        db.execute(insert(CSPViolationDB), batch)
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error storing {len(batch)} CSP reports: {e}")
+        return 0
+    finally:
+        db.close()
+    return len(batch)
+
+
+async def csp_report_flusher():
+    """Background task started in lifespan: flush buffered CSP reports periodically."""
+    while True:
+        await asyncio.sleep(CSP_FLUSH_INTERVAL_SECONDS)
+        await asyncio.to_thread(flush_csp_reports)
+
+
 @app.post("/api/csp-report")
 @limiter.limit("100/minute")
 async def csp_violation_report(request: Request):
@@ -373,37 +578,30 @@ async def csp_violation_report(request: Request):
     Browsers send reports here when CSP violations occur.
     We log them to track potential XSS attempts or misconfigurations.
     """
-    from .database import SessionLocal, CSPViolationDB
-
     try:
         body = await request.json()
         report = body.get("csp-report", body)
 
-        client_ip = request.client.host if request.client else "unknown"
+        client_ip = get_client_ip(request)
         user_agent = request.headers.get("user-agent")
 
         # Log the violation
         logger.warning(f"CSP_VIOLATION ip={client_ip} directive={report.get('violated-directive')} blocked={report.get('blocked-uri')}")
 
-        # Store in database for analysis
-        db = SessionLocal()
-        try:
-            violation = CSPViolationDB(
-                document_uri=report.get("document-uri"),
-                violated_directive=report.get("violated-directive"),
-                blocked_uri=report.get("blocked-uri"),
-                source_file=report.get("source-file"),
-                line_number=report.get("line-number"),
-                column_number=report.get("column-number"),
-                original_policy=report.get("original-policy"),
-                disposition=report.get("disposition"),
-                user_agent=user_agent,
-                ip_address=client_ip
-            )
-            db.add(violation)
-            db.commit()
-        finally:
-            db.close()
+        # Queue for the batched insert (csp_report_flusher)
+        csp_report_buffer.append({
+            "document_uri": report.get("document-uri"),
+            "violated_directive": report.get("violated-directive"),
+            "blocked_uri": report.get("blocked-uri"),
+            "source_file": report.get("source-file"),
+            "line_number": report.get("line-number"),
+            "column_number": report.get("column-number"),
+            "original_policy": report.get("original-policy"),
+            "disposition": report.get("disposition"),
+            "user_agent": user_agent,
+            "ip_address": client_ip,
+            "created_at": datetime.utcnow(),
+        })
 
     except Exception as e:
         logger.error(f"Error processing CSP report: {e}")
@@ -422,9 +620,6 @@ async def get_csp_violations(
     """
     Get recent CSP violations for analysis (admin only in production).
     """
-    from .database import SessionLocal, CSPViolationDB
-    from sqlalchemy import desc
-
     db = SessionLocal()
     try:
         violations = db.query(CSPViolationDB).order_by(
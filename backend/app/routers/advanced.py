@@ -3,7 +3,13 @@ Router para funcionalidades avanzadas
 Pattern Mining, Simulador, Diagnósticos, Persistencia, etc.
 """
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from typing import List, NamedTuple, Optional
+from cachetools import LRUCache, TTLCache
+import asyncio
+import copy
+import itertools
+import threading
 import pandas as pd
 
 from ..auth import get_current_user
@@ -42,15 +48,104 @@ from ..services.csv_processor import process_csv
 
 router = APIRouter()
 
-# In-memory storage for demo (replace with DB in production)
-_client_data = {}
+# In-memory storage for demo (replace with DB in production).
+# Bounded so uploads can't grow the process without limit; the least recently
+# used client is evicted and has to upload again.
+CLIENT_DATA_MAX_CLIENTS = 32
+
+# Frequent 404 details, shared by every endpoint that raises them
+CLIENT_NOT_FOUND_DETAIL = "Cliente no encontrado. Suba datos primero."
+SNAPSHOT_NOT_FOUND_DETAIL = "Snapshot no encontrado"
+
+
+def _not_found(detail: str) -> HTTPException:
+    """Build a fresh 404; instances are not shared between requests."""
+    return HTTPException(status_code=404, detail=detail)
+
+
+class ClientMeta(NamedTuple):
+    """Resumen de los datos del cliente, calculado una vez al subirlos."""
+    date_min: str
+    date_max: str
+    n_campaigns: int
+    n_ads: int
+    total_spend: float
+    total_results: float
+    total_impressions: float
+    avg_ctr: float
+
+
+class ClientData(NamedTuple):
+    """Datos subidos de un cliente; version cambia con cada upload."""
+    version: int
+    df: pd.DataFrame
+    meta: ClientMeta
+
+
+# Only touched from the event loop: LRUCache reorders entries on get() and is
+# not thread-safe. Worker threads receive a resolved ClientData instead.
+_client_data: LRUCache = LRUCache(maxsize=CLIENT_DATA_MAX_CLIENTS)
+_upload_versions = itertools.count(1)
+
+
+def _compute_client_meta(df: pd.DataFrame) -> ClientMeta:
+    totals = df[['spend', 'results', 'impressions']].sum()
+    return ClientMeta(
+        date_min=df['date'].min().isoformat(),
+        date_max=df['date'].max().isoformat(),
+        n_campaigns=int(df['campaign_name'].nunique()),
+        n_ads=int(df['ad_name'].nunique()),
+        total_spend=float(totals['spend']),
+        total_results=float(totals['results']),
+        total_impressions=float(totals['impressions']),
+        avg_ctr=float(df['ctr'].mean()),
+    )
+
+
+def _get_client_data(client_id: str) -> ClientData:
+    """Helper to get client data, version and summary together."""
+    data = _client_data.get(client_id)  # get() marks the client as recently used
+    if data is None:
+        raise _not_found(CLIENT_NOT_FOUND_DETAIL)
+    return data
 
 
 def _get_client_df(client_id: str) -> pd.DataFrame:
     """Helper to get client data."""
-    if client_id not in _client_data:
-        raise HTTPException(status_code=404, detail="Cliente no encontrado. Suba datos primero.")
-    return _client_data[client_id]
+    return _get_client_data(client_id).df
+
+
+# Analysis results keyed by (function, upload version, args). Versions are
+# unique per upload, so results from replaced data are never read again and
+# simply age out. The TTL bounds how long results that depend on the current
+# date (forecasts, "last N days" windows) are reused. Guarded by a lock: filled
+# from worker threads.
+ANALYSIS_CACHE_TTL_SECONDS = 300
+_analysis_cache: TTLCache = TTLCache(maxsize=256, ttl=ANALYSIS_CACHE_TTL_SECONDS)
+_analysis_cache_lock = threading.Lock()
+
+
+def _cached_analysis(data: ClientData, func, *args):
+    """
+    Run func(data.df, *args), memoized for ANALYSIS_CACHE_TTL_SECONDS or
+    until the client's next upload.
+
+    Callers get their own deep copy, so they may change or persist it.
+    """
+    key = (func.__name__, data.version, args)
+    with _analysis_cache_lock:
+        result = _analysis_cache.get(key)
+    if result is None:
+        result = func(data.df, *args)
+        with _analysis_cache_lock:
+            _analysis_cache[key] = result
+    return copy.deepcopy(result)
+
+
+async def _gather_in_threadpool(calls: dict) -> dict:
+    """Run {key: (func, *args)} concurrently in the threadpool and return {key: result}."""
+    results = await asyncio.gather(*(run_in_threadpool(*call) for call in calls.values()))
+    return dict(zip(calls.keys(), results))
 
 
 # ==================== DATA UPLOAD ====================
@@ -61,20 +156,21 @@ async def upload_client_data(client_id: str, file: UploadFile = File(...), curre
     Sube datos CSV de Meta Ads para un cliente.
     """
     try:
-        content = await file.read()
-        df = process_csv(content)
-        _client_data[client_id] = df
+        # UploadFile is already spooled to disk; parse it in place off the event loop
+        df = await run_in_threadpool(process_csv, file.file)
+        meta = _compute_client_meta(df)
+        _client_data[client_id] = ClientData(next(_upload_versions), df, meta)
 
         return {
             "success": True,
             "message": f"Datos cargados para {client_id}",
             "rows": len(df),
             "date_range": {
-                "start": df['date'].min().isoformat(),
-                "end": df['date'].max().isoformat()
+                "start": meta.date_min,
+                "end": meta.date_max
             },
-            "campaigns": df['campaign_name'].nunique(),
-            "ads": df['ad_name'].nunique()
+            "campaigns": meta.n_campaigns,
+            "ads": meta.n_ads
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -87,8 +183,7 @@ async def get_patterns(client_id: str, current_user: UserDB = Depends(get_curren
     """
     Detecta patrones de performance en los datos del cliente.
     """
-    df = _get_client_df(client_id)
-    patterns = mine_patterns(df)
+    patterns = _cached_analysis(_get_client_data(client_id), mine_patterns)
     return [PatternMatch(**p) for p in patterns]
 
 
@@ -120,8 +215,7 @@ async def get_structure_diagnostics(client_id: str, current_user: UserDB = Depen
     """
     Diagnostica problemas de estructura de la cuenta.
     """
-    df = _get_client_df(client_id)
-    diagnostics = diagnose_account_structure(df)
+    diagnostics = _cached_analysis(_get_client_data(client_id), diagnose_account_structure)
     return [StructureDiagnostic(**d) for d in diagnostics]
 
 
@@ -130,8 +224,7 @@ async def get_quality_score(client_id: str, current_user: UserDB = Depends(get_c
     """
     Calcula el score de calidad de la cuenta.
     """
-    df = _get_client_df(client_id)
-    result = calculate_account_quality_score(df)
+    result = _cached_analysis(_get_client_data(client_id), calculate_account_quality_score)
     return AccountQualityScore(**result)
 
 
@@ -140,8 +233,7 @@ async def get_saturation(client_id: str, current_user: UserDB = Depends(get_curr
     """
     Predice saturación de audiencia.
     """
-    df = _get_client_df(client_id)
-    result = predict_audience_saturation(df)
+    result = _cached_analysis(_get_client_data(client_id), predict_audience_saturation)
     return AudienceSaturation(**result)
 
 
@@ -150,8 +242,7 @@ async def get_competition(client_id: str, current_user: UserDB = Depends(get_cur
     """
     Analiza presión competitiva proxy.
     """
-    df = _get_client_df(client_id)
-    result = analyze_competition_proxy(df)
+    result = _cached_analysis(_get_client_data(client_id), analyze_competition_proxy)
     return CompetitionProxy(**result)
 
 
@@ -187,26 +278,24 @@ async def create_snapshot(request: SaveSnapshotRequest, current_user: UserDB = D
     """
     Guarda un snapshot del análisis actual.
     """
-    df = _get_client_df(request.client_id)
-
-    # Calculate metrics summary
-    total_spend = df['spend'].sum()
-    total_results = df['results'].sum()
+    data = _get_client_data(request.client_id)
+    meta = data.meta
 
+    # Metrics summary comes from the totals computed at upload
     metrics_summary = {
-        'total_spend': total_spend,
-        'total_results': total_results,
-        'avg_cpr': total_spend / total_results if total_results > 0 else 0,
-        'avg_ctr': df['ctr'].mean(),
-        'total_impressions': df['impressions'].sum(),
-        'unique_ads': df['ad_name'].nunique()
+        'total_spend': meta.total_spend,
+        'total_results': meta.total_results,
+        'avg_cpr': meta.total_spend / meta.total_results if meta.total_results > 0 else 0,
+        'avg_ctr': meta.avg_ctr,
+        'total_impressions': meta.total_impressions,
+        'unique_ads': meta.n_ads
     }
 
     # For now, pass empty analysis (could be expanded)
-    analysis_data = {
-        'patterns': mine_patterns(df),
-        'quality_score': calculate_account_quality_score(df)
-    }
+    analysis_data = await _gather_in_threadpool({
+        'patterns': (_cached_analysis, data, mine_patterns),
+        'quality_score': (_cached_analysis, data, calculate_account_quality_score)
+    })
 
     result = save_snapshot(
         request.client_id,
@@ -235,7 +324,7 @@ async def get_snapshot_detail(client_id: str, snapshot_id: str, current_user: Us
     """
     snapshot = get_snapshot(client_id, snapshot_id)
     if not snapshot:
-        raise HTTPException(status_code=404, detail="Snapshot no encontrado")
+        raise _not_found(SNAPSHOT_NOT_FOUND_DETAIL)
     return snapshot
 
 
@@ -355,18 +444,18 @@ async def get_full_analysis(client_id: str, current_user: UserDB = Depends(get_c
     """
     Ejecuta el análisis completo y retorna todos los insights.
     """
-    df = _get_client_df(client_id)
+    data = _get_client_data(client_id)
 
-    return {
-        "quality_score": calculate_account_quality_score(df),
-        "patterns": mine_patterns(df),
-        "structure_diagnostics": diagnose_account_structure(df),
-        "saturation": predict_audience_saturation(df),
-        "competition": analyze_competition_proxy(df),
-        "config": get_client_config(client_id),
-        "learnings": get_learnings(client_id),
-        "recent_actions": get_actions_summary(client_id, 30)
-    }
+    return await _gather_in_threadpool({
+        "quality_score": (_cached_analysis, data, calculate_account_quality_score),
+        "patterns": (_cached_analysis, data, mine_patterns),
+        "structure_diagnostics": (_cached_analysis, data, diagnose_account_structure),
+        "saturation": (_cached_analysis, data, predict_audience_saturation),
+        "competition": (_cached_analysis, data, analyze_competition_proxy),
+        "config": (get_client_config, client_id),
+        "learnings": (get_learnings, client_id),
+        "recent_actions": (get_actions_summary, client_id, 30)
+    })
 
 
 # ==================== ML PREDICTIONS ====================
@@ -377,8 +466,7 @@ async def get_fatigue_predictions(client_id: str, current_user: UserDB = Depends
     Predice fatiga de anuncios usando ML.
     Retorna lista de anuncios ordenados por urgencia de acción.
     """
-    df = _get_client_df(client_id)
-    predictions = predict_ad_fatigue(df)
+    predictions = _cached_analysis(_get_client_data(client_id), predict_ad_fatigue)
 
     return {
         "predictions": predictions,
@@ -400,8 +488,7 @@ async def get_roas_forecast(client_id: str, days_ahead: int = 7):
     if days_ahead < 1 or days_ahead > 30:
         raise HTTPException(status_code=400, detail="days_ahead debe estar entre 1 y 30")
 
-    df = _get_client_df(client_id)
-    forecast = forecast_roas(df, days_ahead)
+    forecast = _cached_analysis(_get_client_data(client_id), forecast_roas, days_ahead)
 
     if 'error' in forecast:
         raise HTTPException(status_code=400, detail=forecast['error'])
@@ -420,8 +507,7 @@ async def get_anomalies(client_id: str, sensitivity: float = 2.0):
     if sensitivity < 1.5 or sensitivity > 4.0:
         raise HTTPException(status_code=400, detail="sensitivity debe estar entre 1.5 y 4.0")
 
-    df = _get_client_df(client_id)
-    anomalies = detect_anomalies(df, sensitivity)
+    anomalies = _cached_analysis(_get_client_data(client_id), detect_anomalies, sensitivity)
     summary = get_anomaly_summary(anomalies)
 
     return {
@@ -436,7 +522,6 @@ async def get_consolidated_insights(client_id: str, current_user: UserDB = Depen
     Ejecuta todos los modelos ML y devuelve un resumen consolidado.
     Incluye: predicción de fatiga, forecast de ROAS, detección de anomalías.
     """
-    df = _get_client_df(client_id)
-    insights = get_ml_insights(df)
+    insights = _cached_analysis(_get_client_data(client_id), get_ml_insights)
 
     return insights
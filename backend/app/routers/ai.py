@@ -3,18 +3,20 @@ AI Router for Emiti Metrics
 Endpoints for AI-powered features with memory and learning
 """
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Request, Header
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from typing import List, Dict, Optional
-import json
+import asyncio
 import os
+import time
 import httpx
+import orjson
 
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from ..auth import get_current_user
 from ..database import UserDB
+from ..services.security import get_rate_limit_key
 
 # CRM API Key for cross-service auth
 CRM_API_KEY = os.getenv("CRM_API_KEY", "")
@@ -61,14 +63,6 @@ async def verify_crm_auth(
         # If Supabase is slow, allow request with just API key (graceful degradation)
         return {"id": "unverified", "email": "unknown"}
 
-# Rate limiter - uses remote address as key
-def get_rate_limit_key(request: Request) -> str:
-    """Get rate limit key - user_id if authenticated, otherwise IP."""
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        return f"user:{auth_header[:50]}"
-    return get_remote_address(request)
-
 limiter = Limiter(key_func=get_rate_limit_key)
 
 from ..services.ai_service import (
@@ -109,6 +103,52 @@ from ..services.ai_memory import (
 
 router = APIRouter()
 
+# SSE chat streaming: coalesce model tokens into one frame per batch
+SSE_BATCH_TOKENS = 8
+SSE_BATCH_SECONDS = 0.02
+
+
+def _sse_token_frame(parts: List[str]) -> bytes:
+    return b"data: " + orjson.dumps({"token": "".join(parts)}) + b"\n\n"
+
+
+async def _batched_sse_frames(chunks):
+    """
+    Yield SSE frames carrying the concatenated text of up to SSE_BATCH_TOKENS
+    chunks, so clients appending each "token" see the same text with fewer
+    events. A batch is flushed SSE_BATCH_SECONDS after its first chunk even
+    if the model pauses, so no text already received is held back.
+    """
+    stream = chunks.__aiter__()
+    batch = []
+    batch_deadline = 0.0
+    # A single pending __anext__ is awaited with a timeout; cancelling it on
+    # timeout (as asyncio.wait_for would) would abort the model stream.
+    pending = asyncio.ensure_future(stream.__anext__())
+    try:
+        while True:
+            timeout = max(0.0, batch_deadline - time.monotonic()) if batch else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield _sse_token_frame(batch)
+                batch = []
+                continue
+            try:
+                chunk = pending.result()
+            except StopAsyncIteration:
+                break
+            if not batch:
+                batch_deadline = time.monotonic() + SSE_BATCH_SECONDS
+            batch.append(chunk)
+            pending = asyncio.ensure_future(stream.__anext__())
+            if len(batch) >= SSE_BATCH_TOKENS:
+                yield _sse_token_frame(batch)
+                batch = []
+    finally:
+        pending.cancel()
+    if batch:
+        yield _sse_token_frame(batch)
+
 
 # ==================== MODELS ====================
 
@@ -117,8 +157,13 @@ class ChatMessage(BaseModel):
     content: str
 
 
+def _history_dicts(history: Optional[List[ChatMessage]]) -> List[Dict[str, str]]:
+    """Plain role/content dicts for the AI service, without going through model_dump()."""
+    return [{"role": m.role, "content": m.content} for m in history] if history else []
+
+
 class ChatRequest(BaseModel):
-    message: str
+    message: str = Field(..., min_length=1)
     client_id: Optional[str] = None
     chat_history: Optional[List[ChatMessage]] = []
     data_context: Optional[Dict] = {}
@@ -132,7 +177,7 @@ class CreativeAnalysisRequest(BaseModel):
 
 
 class CompareCreativesRequest(BaseModel):
-    images: List[Dict]  # [{"data": base64, "type": mime_type, "name": str}]
+    images: List[Dict] = Field(..., min_length=2, max_length=4)  # [{"data": base64, "type": mime_type, "name": str}]
 
 
 class ReportRequest(BaseModel):
@@ -246,14 +291,14 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest, current_use
     Returns a streaming response.
     """
     async def stream_response():
-        async for chunk in chat_with_data(
+        async for frame in _batched_sse_frames(chat_with_data(
             user_message=chat_request.message,
             data_context=chat_request.data_context,
-            chat_history=[m.model_dump() for m in chat_request.chat_history] if chat_request.chat_history else [],
+            chat_history=_history_dicts(chat_request.chat_history),
             stream=True
-        ):
-            yield f"data: {json.dumps({'token': chunk})}\n\n"
-        yield "data: [DONE]\n\n"
+        )):
+            yield frame
+        yield b"data: [DONE]\n\n"
 
     return StreamingResponse(
         stream_response(),
@@ -271,16 +316,16 @@ async def chat_sync_endpoint(request: Request, chat_request: ChatRequest, curren
     """
     Chat with your ad data using AI (non-streaming version).
     """
-    result = ""
+    parts = []
     async for chunk in chat_with_data(
         user_message=chat_request.message,
         data_context=chat_request.data_context,
-        chat_history=[m.model_dump() for m in chat_request.chat_history] if chat_request.chat_history else [],
+        chat_history=_history_dicts(chat_request.chat_history),
         stream=True
     ):
-        result += chunk
+        parts.append(chunk)
 
-    return {"response": result}
+    return {"response": "".join(parts)}
 
 
 class CRMChatRequest(BaseModel):
@@ -293,7 +338,7 @@ class CRMChatRequest(BaseModel):
 
 class CRMFeedbackRequest(BaseModel):
     message_id: str
-    rating: int  # 1-5
+    rating: int = Field(..., ge=1, le=5)
     user_id: Optional[str] = "crm_default"
     original_query: Optional[str] = None
     response: Optional[str] = None
@@ -314,7 +359,7 @@ async def chat_crm_endpoint(
     response, conversation_id = await chat_crm(
         user_message=request.message,
         data_context=request.data_context or {},
-        chat_history=[m.model_dump() for m in request.chat_history] if request.chat_history else [],
+        chat_history=_history_dicts(request.chat_history),
         user_id=user_id
     )
 
@@ -428,12 +473,6 @@ async def compare_creatives_endpoint(request: Request, compare_request: CompareC
     """
     Compare multiple ad creatives and get recommendations.
     """
-    if len(compare_request.images) < 2:
-        raise HTTPException(status_code=400, detail="Need at least 2 images to compare")
-
-    if len(compare_request.images) > 4:
-        raise HTTPException(status_code=400, detail="Maximum 4 images allowed")
-
     result = await compare_creatives(compare_request.images)
 
     if "error" in result:
@@ -519,47 +558,51 @@ async def quick_analysis(client_id: str, question: str = "¿Cómo está la cuent
     }
 
 
+# The payload never changes: serialize it once at import
+SUGGESTED_QUESTIONS_JSON = orjson.dumps({
+    "categories": [
+        {
+            "name": "Performance General",
+            "questions": [
+                "¿Cómo está la cuenta en general?",
+                "¿Cuál es el resumen de esta semana?",
+                "¿Hay algún problema que deba atender?"
+            ]
+        },
+        {
+            "name": "Optimización",
+            "questions": [
+                "¿Qué campañas debería pausar?",
+                "¿Dónde debería aumentar el presupuesto?",
+                "¿Qué creativos están funcionando mejor?"
+            ]
+        },
+        {
+            "name": "Análisis",
+            "questions": [
+                "¿Por qué subió el CPR esta semana?",
+                "¿Cuáles son los patrones de éxito?",
+                "¿Cómo se compara con el mes pasado?"
+            ]
+        },
+        {
+            "name": "Reportes",
+            "questions": [
+                "Genera un resumen para el cliente",
+                "¿Cuáles fueron los logros del período?",
+                "¿Qué debería comunicar al cliente?"
+            ]
+        }
+    ]
+})
+
+
 @router.get("/suggested-questions")
 async def get_suggested_questions():
     """
     Get suggested questions for the AI chat.
     """
-    return {
-        "categories": [
-            {
-                "name": "Performance General",
-                "questions": [
-                    "¿Cómo está la cuenta en general?",
-                    "¿Cuál es el resumen de esta semana?",
-                    "¿Hay algún problema que deba atender?"
-                ]
-            },
-            {
-                "name": "Optimización",
-                "questions": [
-                    "¿Qué campañas debería pausar?",
-                    "¿Dónde debería aumentar el presupuesto?",
-                    "¿Qué creativos están funcionando mejor?"
-                ]
-            },
-            {
-                "name": "Análisis",
-                "questions": [
-                    "¿Por qué subió el CPR esta semana?",
-                    "¿Cuáles son los patrones de éxito?",
-                    "¿Cómo se compara con el mes pasado?"
-                ]
-            },
-            {
-                "name": "Reportes",
-                "questions": [
-                    "Genera un resumen para el cliente",
-                    "¿Cuáles fueron los logros del período?",
-                    "¿Qué debería comunicar al cliente?"
-                ]
-            }
-        ]
-    }
+    return Response(content=SUGGESTED_QUESTIONS_JSON, media_type="application/json")
 
 
 # ==================== AI MEMORY & LEARNING ====================
@@ -580,7 +623,7 @@ class KnowledgeEntry(BaseModel):
 
 class FeedbackRequest(BaseModel):
     conversation_id: int
-    rating: int  # 1-5
+    rating: int = Field(..., ge=1, le=5)
     message_id: Optional[str] = None
     comment: Optional[str] = None
 
@@ -2,13 +2,14 @@
 Router para endpoints de alertas
 """
 from fastapi import APIRouter, HTTPException, Depends
-from ..auth import get_current_user
+from ..auth import get_current_user_async
 from ..database import UserDB
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
 
-from ..database import get_db, AlertDB
+from ..database import get_async_db, AlertDB
 from ..models.schemas import Alert, AlertSeverity, AlertType
 
 router = APIRouter()
@@ -39,22 +40,23 @@ async def list_alerts(
     acknowledged: Optional[bool] = None,
     severity: Optional[AlertSeverity] = None,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserDB = Depends(get_current_user_async)
 ):
     """Lista todas las alertas."""
-    query = db.query(AlertDB)
+    query = select(AlertDB)
 
     if client_id:
-        query = query.filter(AlertDB.client_id == client_id)
+        query = query.where(AlertDB.client_id == client_id)
 
     if acknowledged is not None:
-        query = query.filter(AlertDB.acknowledged == acknowledged)
+        query = query.where(AlertDB.acknowledged == acknowledged)
 
     if severity is not None:
-        query = query.filter(AlertDB.severity == severity.value)
+        query = query.where(AlertDB.severity == severity.value)
 
-    alerts = query.order_by(AlertDB.created_at.desc()).limit(limit).all()
+    result = await db.execute(query.order_by(AlertDB.created_at.desc()).limit(limit))
+    alerts = result.scalars().all()
 
     return [alert_to_schema(a) for a in alerts]
 
@@ -62,16 +64,17 @@ async def list_alerts(
 @router.get("/active")
 async def get_active_alerts(
     client_id: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserDB = Depends(get_current_user_async)
 ):
     """Obtiene solo alertas no reconocidas."""
-    query = db.query(AlertDB).filter(AlertDB.acknowledged == False)
+    query = select(AlertDB).where(AlertDB.acknowledged == False)
 
     if client_id:
-        query = query.filter(AlertDB.client_id == client_id)
+        query = query.where(AlertDB.client_id == client_id)
 
-    alerts = query.order_by(AlertDB.created_at.desc()).all()
+    result = await db.execute(query.order_by(AlertDB.created_at.desc()))
+    alerts = result.scalars().all()
 
     return [alert_to_schema(a) for a in alerts]
 
@@ -79,39 +82,50 @@ async def get_active_alerts(
 @router.get("/count")
 async def get_alerts_count(
     client_id: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserDB = Depends(get_current_user_async)
 ):
     """Cuenta alertas por estado y severidad."""
-    base_query = db.query(AlertDB)
+    is_active = AlertDB.acknowledged == False
+
+    def active_count(*conditions):
+        return func.count(case((and_(is_active, *conditions), 1)))
+
+    # One query with the same predicates as the per-bucket COUNTs
+    query = select(
+        func.count(),
+        active_count(),
+        active_count(AlertDB.severity == "CRITICAL"),
+        active_count(AlertDB.severity == "WARNING"),
+        active_count(AlertDB.severity == "INFO"),
+    ).select_from(AlertDB)
 
     if client_id:
-        base_query = base_query.filter(AlertDB.client_id == client_id)
+        query = query.where(AlertDB.client_id == client_id)
 
-    total = base_query.count()
-    active_query = base_query.filter(AlertDB.acknowledged == False)
+    total, active, critical, warning, info = (await db.execute(query)).one()
 
     return {
         "total": total,
-        "active": active_query.count(),
+        "active": active,
         "by_severity": {
-            "critical": active_query.filter(AlertDB.severity == "CRITICAL").count(),
-            "warning": active_query.filter(AlertDB.severity == "WARNING").count(),
-            "info": active_query.filter(AlertDB.severity == "INFO").count()
+            "critical": critical,
+            "warning": warning,
+            "info": info
         }
     }
 
 
 @router.post("/{alert_id}/acknowledge")
-async def acknowledge_alert(alert_id: str, db: Session = Depends(get_db), current_user: UserDB = Depends(get_current_user)):
+async def acknowledge_alert(alert_id: str, db: AsyncSession = Depends(get_async_db), current_user: UserDB = Depends(get_current_user_async)):
     """Marca una alerta como reconocida."""
-    alert = db.query(AlertDB).filter(AlertDB.id == alert_id).first()
+    alert = await db.get(AlertDB, alert_id)
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
 
     alert.acknowledged = True
-    db.commit()
+    await db.commit()
 
     return {"success": True, "message": "Alerta marcada como leída"}
 
@@ -119,25 +133,25 @@ async def acknowledge_alert(alert_id: str, db: Session = Depends(get_db), curren
 @router.post("/acknowledge-all")
 async def acknowledge_all_alerts(
     client_id: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: UserDB = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserDB = Depends(get_current_user_async)
 ):
     """Marca todas las alertas como reconocidas."""
-    query = db.query(AlertDB).filter(AlertDB.acknowledged == False)
+    query = update(AlertDB).where(AlertDB.acknowledged == False).values(acknowledged=True)
 
     if client_id:
-        query = query.filter(AlertDB.client_id == client_id)
+        query = query.where(AlertDB.client_id == client_id)
 
-    count = query.update({"acknowledged": True})
-    db.commit()
+    count = (await db.execute(query)).rowcount
+    await db.commit()
 
     return {"success": True, "acknowledged_count": count}
 
 
 @router.get("/{alert_id}")
-async def get_alert(alert_id: str, db: Session = Depends(get_db), current_user: UserDB = Depends(get_current_user)):
+async def get_alert(alert_id: str, db: AsyncSession = Depends(get_async_db), current_user: UserDB = Depends(get_current_user_async)):
     """Obtiene una alerta por ID."""
-    alert = db.query(AlertDB).filter(AlertDB.id == alert_id).first()
+    alert = await db.get(AlertDB, alert_id)
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
@@ -146,14 +160,14 @@ async def get_alert(alert_id: str, db: Session = Depends(get_db), current_user:
 
 
 @router.delete("/{alert_id}")
-async def delete_alert(alert_id: str, db: Session = Depends(get_db), current_user: UserDB = Depends(get_current_user)):
+async def delete_alert(alert_id: str, db: AsyncSession = Depends(get_async_db), current_user: UserDB = Depends(get_current_user_async)):
     """Elimina una alerta."""
-    alert = db.query(AlertDB).filter(AlertDB.id == alert_id).first()
+    alert = await db.get(AlertDB, alert_id)
 
     if not alert:
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
 
-    db.delete(alert)
-    db.commit()
+    await db.delete(alert)
+    await db.commit()
 
     return {"success": True, "message": "Alerta eliminada"}
@@ -2,16 +2,32 @@
 Router para endpoints de análisis - CON DATOS REALES
 """
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from sqlalchemy import func, desc, distinct
 from typing import Optional
 from datetime import datetime, timedelta
 
 from ..auth import get_current_user
-from ..database import get_db, MetricDB, ClientDB, CampaignDB, UserDB
+from ..database import get_db, MetricDB, MetricDailySummaryDB, ClientDB, CampaignDB, UserDB, metrics_cache
 
 router = APIRouter()
 
+# Read pattern for MetricDB listings: load only the columns the per-ad and
+# per-campaign aggregations use; the optional purchase/lead/ROAS columns stay out
+# of the SELECT and out of ORM hydration.
+AD_METRIC_COLUMNS = load_only(
+    MetricDB.client_id,
+    MetricDB.date,
+    MetricDB.campaign_name,
+    MetricDB.ad_set_name,
+    MetricDB.ad_name,
+    MetricDB.spend,
+    MetricDB.impressions,
+    MetricDB.reach,
+    MetricDB.clicks,
+    MetricDB.results,
+)
+
 
 def classify_ad(cpr: float, ctr: float, frequency: float, results: int, days: int, spend: float = 0, threshold_cpr: float = 300):
     """
@@ -116,6 +132,11 @@ async def get_dashboard_summary(
     current_user: UserDB = Depends(get_current_user)
 ):
     """Resumen del dashboard con datos reales."""
+    cache_key = ("dashboard", client_id, brand_id, days, start_date, end_date)
+    cached = metrics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     # Date range - use custom dates if provided
     if start_date and end_date:
         try:
@@ -129,7 +150,7 @@ async def get_dashboard_summary(
         start_dt = end_dt - timedelta(days=days)
 
     # Base query
-    query = db.query(MetricDB).filter(
+    query = db.query(MetricDB).options(AD_METRIC_COLUMNS).filter(
         MetricDB.date >= start_dt,
         MetricDB.date < end_dt
     )
@@ -147,7 +168,7 @@ async def get_dashboard_summary(
     metrics = query.all()
 
     if not metrics:
-        return {
+        metrics_cache[cache_key] = {
             "total_spend": 0,
             "total_impressions": 0,
             "total_results": 0,
@@ -161,6 +182,7 @@ async def get_dashboard_summary(
             "top_ads": [],
             "period_days": days
         }
+        return metrics_cache[cache_key]
 
     # Aggregate totals
     total_spend = sum(m.spend or 0 for m in metrics)
@@ -251,7 +273,7 @@ async def get_dashboard_summary(
     # Sort by results descending, take top 10
     top_ads = sorted(top_ads, key=lambda x: x["results"], reverse=True)[:10]
 
-    return {
+    metrics_cache[cache_key] = {
         "total_spend": total_spend,
         "total_impressions": total_impressions,
         "total_results": total_results,
@@ -265,6 +287,7 @@ async def get_dashboard_summary(
         "top_ads": top_ads,
         "period_days": days
     }
+    return metrics_cache[cache_key]
 
 
 @router.get("/comparison")
@@ -296,17 +319,22 @@ async def compare_periods(
     filter_client = brand_id or client_id
 
     def get_period_metrics(start, end):
-        query = db.query(MetricDB).filter(
-            MetricDB.date >= start,
-            MetricDB.date < end
+        # Period totals come from the daily pre-aggregate: one row per client-day
+        query = db.query(
+            func.sum(MetricDailySummaryDB.spend),
+            func.sum(MetricDailySummaryDB.results),
+            func.sum(MetricDailySummaryDB.impressions)
+        ).filter(
+            MetricDailySummaryDB.date >= start,
+            MetricDailySummaryDB.date < end
         )
         if filter_client:
-            query = query.filter(MetricDB.client_id == filter_client)
+            query = query.filter(MetricDailySummaryDB.client_id == filter_client)
 
-        metrics = query.all()
-        spend = sum(m.spend or 0 for m in metrics)
-        results = sum(m.results or 0 for m in metrics)
-        impressions = sum(m.impressions or 0 for m in metrics)
+        spend, results, impressions = query.one()
+        spend = spend or 0
+        results = results or 0
+        impressions = impressions or 0
         cpr = spend / results if results > 0 else 0
 
         return {"spend": spend, "results": results, "impressions": impressions, "cpr": cpr}
@@ -354,7 +382,7 @@ async def get_ads_analysis(
         end_dt = datetime.utcnow()
         start_dt = end_dt - timedelta(days=days)
 
-    query = db.query(MetricDB).filter(
+    query = db.query(MetricDB).options(AD_METRIC_COLUMNS).filter(
         MetricDB.date >= start_dt,
         MetricDB.date < end_dt
     )
@@ -445,7 +473,7 @@ async def get_campaigns_analysis(
         end_dt = datetime.utcnow()
         start_dt = end_dt - timedelta(days=days)
 
-    query = db.query(MetricDB).filter(
+    query = db.query(MetricDB).options(AD_METRIC_COLUMNS).filter(
         MetricDB.date >= start_dt,
         MetricDB.date < end_dt
     )
@@ -17,8 +17,6 @@ import re
 import logging
 import secrets
 
-import hashlib
-
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -35,10 +33,13 @@ if not audit_logger.handlers:
 
 from ..database import get_db, UserDB, RefreshTokenDB, LoginHistoryDB, SecurityAlertDB
 from ..auth import (
-    get_password_hash,
-    verify_password,
+    averify_password,
+    aget_password_hash,
+    password_needs_rehash,
     create_access_token,
     get_current_user,
+    get_current_db_user,
+    user_token_claims,
     create_refresh_token,
     verify_refresh_token,
     revoke_refresh_token,
@@ -47,6 +48,7 @@ from ..auth import (
 )
 from ..services.security import (
     check_ip_allowed,
+    get_client_ip,
     record_failed_login,
     reset_failed_logins,
     is_account_locked,
@@ -311,7 +313,7 @@ async def login(credentials: UserLogin, request: Request, db: Session = Depends(
     If user does not have 2FA:
         - Returns access_token, refresh_token, and user info directly
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
     user_agent = request.headers.get("user-agent")
 
     # Rate limit check
@@ -346,7 +348,7 @@ async def login(credentials: UserLogin, request: Request, db: Session = Depends(
         )
 
     # Validate credentials
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if not user or not await averify_password(credentials.password, user.hashed_password):
         audit_logger.warning(f"LOGIN_FAILED ip={client_ip} email={credentials.email}")
         if user:
             record_failed_login(user, client_ip, db, reason="invalid_password")
@@ -355,6 +357,12 @@ async def login(credentials: UserLogin, request: Request, db: Session = Depends(
             detail="Incorrect email or password"
         )
 
+    # Transparently upgrade legacy bcrypt hashes to argon2id
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await aget_password_hash(credentials.password)
+        db.commit()
+        audit_logger.info(f"PASSWORD_REHASHED user_id={user.id}")
+
     # Check if user is active
     if not user.is_active:
         audit_logger.warning(f"LOGIN_INACTIVE_USER ip={client_ip} user_id={user.id}")
@@ -384,7 +392,7 @@ async def login(credentials: UserLogin, request: Request, db: Session = Depends(
 
     # Create short-lived access token (15 minutes)
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=user_token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -425,7 +433,7 @@ async def refresh_access_token(
         - refresh_token: New refresh token (old one is revoked)
         - expires_in: Access token expiration in seconds
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     # Verify the refresh token
     refresh_token_db = verify_refresh_token(token_request.refresh_token, db)
@@ -454,7 +462,7 @@ async def refresh_access_token(
 
     # Create new access token
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=user_token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
@@ -483,7 +491,7 @@ async def logout(
     This invalidates the refresh token so it cannot be used to get new access tokens.
     The access token will still be valid until it expires (15 minutes max).
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     # Find and revoke the refresh token
     refresh_token_db = verify_refresh_token(token_request.refresh_token, db)
@@ -510,7 +518,7 @@ async def logout_all(
 
     Requires a valid access token to authenticate the request.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     tokens_revoked = revoke_all_user_refresh_tokens(current_user.id, db)
 
@@ -834,7 +842,7 @@ async def admin_unlock_account(
 @router.post("/2fa/setup", response_model=TwoFactorSetupResponse)
 async def setup_2fa(
     request: Request,
-    current_user: UserDB = Depends(get_current_user),
+    current_user: UserDB = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -848,7 +856,7 @@ async def setup_2fa(
     Note: If 2FA is already enabled, this will generate a new secret but
     the old one remains active until verify-setup is called.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     if current_user.is_2fa_enabled:
         raise HTTPException(
@@ -886,7 +894,7 @@ async def setup_2fa(
 async def verify_2fa_setup(
     verify_request: TwoFactorSetupVerifyRequest,
     request: Request,
-    current_user: UserDB = Depends(get_current_user),
+    current_user: UserDB = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -897,7 +905,7 @@ async def verify_2fa_setup(
 
     Returns backup codes that should be saved securely.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     if current_user.is_2fa_enabled:
         raise HTTPException(
@@ -952,7 +960,7 @@ async def verify_2fa_login(
 
     Backup codes can only be used once.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     # Verify the temporary token
     user_id = consume_temp_2fa_token(verify_request.temp_token)
@@ -1004,7 +1012,7 @@ async def verify_2fa_login(
 
     # Create tokens
     access_token = create_access_token(
-        data={"sub": str(user.id)},
+        data=user_token_claims(user),
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     raw_refresh_token, _ = create_refresh_token(user.id, db)
@@ -1031,7 +1039,7 @@ async def verify_2fa_login(
 async def disable_2fa(
     disable_request: TwoFactorDisableRequest,
     request: Request,
-    current_user: UserDB = Depends(get_current_user),
+    current_user: UserDB = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1043,7 +1051,7 @@ async def disable_2fa(
 
     This is an extra security measure to prevent unauthorized disabling of 2FA.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     if not current_user.is_2fa_enabled:
         raise HTTPException(
@@ -1052,7 +1060,7 @@ async def disable_2fa(
         )
 
     # Verify password first
-    if not verify_password(disable_request.password, current_user.hashed_password):
+    if not await averify_password(disable_request.password, current_user.hashed_password):
         audit_logger.warning(f"2FA_DISABLE_WRONG_PASSWORD ip={client_ip} user_id={current_user.id}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1096,7 +1104,7 @@ async def disable_2fa(
 @router.get("/2fa/backup-codes", response_model=BackupCodesResponse)
 async def regenerate_backup_codes(
     request: Request,
-    current_user: UserDB = Depends(get_current_user),
+    current_user: UserDB = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1105,7 +1113,7 @@ async def regenerate_backup_codes(
     This invalidates all previous backup codes.
     Requires 2FA to be enabled.
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     if not current_user.is_2fa_enabled:
         raise HTTPException(
@@ -1205,7 +1213,7 @@ async def validate_password(
 async def change_password(
     password_request: PasswordChangeRequest,
     request: Request,
-    current_user: UserDB = Depends(get_current_user),
+    current_user: UserDB = Depends(get_current_db_user),
     db: Session = Depends(get_db)
 ):
     """
@@ -1219,10 +1227,10 @@ async def change_password(
     - All existing sessions are revoked (except current)
     - All refresh tokens are revoked
     """
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     # Verify current password
-    if not verify_password(password_request.current_password, current_user.hashed_password):
+    if not await averify_password(password_request.current_password, current_user.hashed_password):
         audit_logger.warning(f"PASSWORD_CHANGE_WRONG_CURRENT ip={client_ip} user_id={current_user.id}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1249,7 +1257,7 @@ async def change_password(
         )
 
     # Update password
-    current_user.hashed_password = get_password_hash(password_request.new_password)
+    current_user.hashed_password = await aget_password_hash(password_request.new_password)
     db.commit()
 
     # Revoke all refresh tokens
@@ -1294,12 +1302,12 @@ async def list_sessions(
     Returns information about each device/browser where the user is logged in.
     """
     from ..database import SessionDB
-    from ..services.session_security import parse_user_agent
+    from ..services.session_security import parse_user_agent, hash_session_token
 
     # Get current token hash to identify current session
     auth_header = request.headers.get("Authorization", "")
     current_token = auth_header.replace("Bearer ", "") if auth_header.startswith("Bearer ") else None
-    current_token_hash = hashlib.sha256(current_token.encode()).hexdigest() if current_token else None
+    current_token_hash = hash_session_token(current_token) if current_token else None
 
     sessions = db.query(SessionDB).filter(
         SessionDB.user_id == current_user.id,
@@ -1338,7 +1346,7 @@ async def revoke_session(
     from ..database import SessionDB
     from ..services.session_security import SessionManager
 
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     manager = SessionManager(db)
     success = manager.revoke_session(current_user.id, session_id)
@@ -1365,14 +1373,14 @@ async def revoke_all_sessions(
 
     This effectively logs out from all other devices.
     """
-    from ..services.session_security import SessionManager
+    from ..services.session_security import SessionManager, hash_session_token
 
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     # Get current token hash
     auth_header = request.headers.get("Authorization", "")
     current_token = auth_header.replace("Bearer ", "") if auth_header.startswith("Bearer ") else None
-    current_token_hash = hashlib.sha256(current_token.encode()).hexdigest() if current_token else None
+    current_token_hash = hash_session_token(current_token) if current_token else None
 
     manager = SessionManager(db)
     count = manager.revoke_all_sessions(current_user.id, except_current=current_token_hash)
@@ -1429,7 +1437,6 @@ async def webauthn_register_start(
         generate_registration_challenge
     )
     from ..database import WebAuthnCredentialDB
-    import base64
 
     if not is_webauthn_available():
         raise HTTPException(
@@ -1443,10 +1450,7 @@ async def webauthn_register_start(
         WebAuthnCredentialDB.is_active == True
     ).all()
 
-    existing_ids = [
-        base64.urlsafe_b64decode(cred.credential_id + "==")
-        for cred in existing_creds
-    ]
+    existing_ids = [cred.credential_id for cred in existing_creds]
 
     try:
         options, challenge_id = generate_registration_challenge(
@@ -1484,7 +1488,7 @@ async def webauthn_register_complete(
     from ..database import WebAuthnCredentialDB
     import base64
 
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     if not is_webauthn_available():
         raise HTTPException(
@@ -1502,7 +1506,7 @@ async def webauthn_register_complete(
         # Store the credential
         new_credential = WebAuthnCredentialDB(
             user_id=current_user.id,
-            credential_id=base64.urlsafe_b64encode(credential_id).decode().rstrip("="),
+            credential_id=credential_id,
             public_key=base64.urlsafe_b64encode(public_key).decode(),
             sign_count=sign_count,
             device_name=register_request.device_name or "Security Key",
@@ -1564,7 +1568,7 @@ async def delete_webauthn_credential(
     """
     from ..database import WebAuthnCredentialDB
 
-    client_ip = request.client.host if request.client else "unknown"
+    client_ip = get_client_ip(request)
 
     credential = db.query(WebAuthnCredentialDB).filter(
         WebAuthnCredentialDB.id == credential_id,
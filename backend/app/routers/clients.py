@@ -29,11 +29,18 @@ async def list_clients(
 
     clients = query.order_by(ClientDB.name).all()
 
+    # One grouped count per table instead of two COUNT queries per client
+    metrics_counts = dict(
+        db.query(MetricDB.client_id, func.count(MetricDB.id)).group_by(MetricDB.client_id).all()
+    )
+    campaigns_counts = dict(
+        db.query(CampaignDB.client_id, func.count(CampaignDB.id)).group_by(CampaignDB.client_id).all()
+    )
+
     result = []
     for c in clients:
-        # Count metrics for this client
-        metrics_count = db.query(func.count(MetricDB.id)).filter(MetricDB.client_id == c.id).scalar() or 0
-        campaigns_count = db.query(func.count(CampaignDB.id)).filter(CampaignDB.client_id == c.id).scalar() or 0
+        metrics_count = metrics_counts.get(c.id, 0)
+        campaigns_count = campaigns_counts.get(c.id, 0)
 
         result.append({
             "id": c.id,
@@ -228,11 +235,12 @@ async def get_client_summary(client_id: str, db: Session = Depends(get_db), curr
     if not client:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
-    # Get metrics summary
-    metrics = db.query(MetricDB).filter(MetricDB.client_id == client_id).all()
-
-    total_spend = sum(m.spend for m in metrics) if metrics else 0
-    total_results = sum(m.results for m in metrics) if metrics else 0
+    # Get metrics summary (aggregated in SQL, no MetricDB rows loaded)
+    total_spend, total_results, data_points = db.query(
+        func.coalesce(func.sum(MetricDB.spend), 0),
+        func.coalesce(func.sum(MetricDB.results), 0),
+        func.count(MetricDB.id)
+    ).filter(MetricDB.client_id == client_id).one()
 
     # Get active alerts count
     active_alerts = db.query(AlertDB).filter(
@@ -256,7 +264,7 @@ async def get_client_summary(client_id: str, db: Session = Depends(get_db), curr
             "total_spend": total_spend,
             "total_results": total_results,
             "avg_cpr": total_spend / total_results if total_results > 0 else 0,
-            "data_points": len(metrics)
+            "data_points": data_points
         },
         "active_alerts": active_alerts,
         "campaigns_count": campaigns_count
@@ -7,23 +7,15 @@ from fastapi import APIRouter, HTTPException, Query, Depends, Request
 from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from ..services.meta_oauth import meta_oauth_service, MetaTokenInfo, TokenStatus
-from ..database import get_db, MetaTokenDB, ClientDB
+from ..database import get_db, get_meta_credentials, MetaTokenDB, ClientDB
 from ..auth import get_current_user
-
-# Rate limiter - uses remote address as key
-def get_rate_limit_key(request: Request) -> str:
-    """Get rate limit key - user_id if authenticated, otherwise IP."""
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        return f"user:{auth_header[:50]}"
-    return get_remote_address(request)
+from ..services.security import get_rate_limit_key
 
 limiter = Limiter(key_func=get_rate_limit_key)
 
@@ -467,7 +459,7 @@ async def get_client_ads_with_images(
     """
     Get ads with their creative images for a client.
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected for this client")
@@ -505,7 +497,7 @@ async def update_client_ad_status(
     """
     Update an ad's status (pause or activate) for a client.
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected")
@@ -538,7 +530,7 @@ async def update_client_campaign_budget(
     Update a campaign's budget for a client.
     Budget values are in cents (e.g., 1000 = $10.00).
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected")
@@ -569,7 +561,7 @@ async def update_client_campaign_status(
     """
     Update a campaign's status for a client.
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected")
@@ -606,7 +598,7 @@ async def quick_pause_ad(
     Quick action to pause an ad by name.
     Looks up the ad ID from Meta and pauses it.
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected")
@@ -653,7 +645,7 @@ async def sync_client_meta_data(
     Manually trigger Meta data sync for a specific client.
     Fetches the latest metrics from Meta Ads API and saves to database.
     """
-    from ..database import MetricDB
+    from ..database import MetricDB, bulk_copy_metrics, refresh_metric_daily_summary, invalidate_metrics_cache
 
     # Get client
     client = db.query(ClientDB).filter(ClientDB.id == client_id, ClientDB.is_active == True).first()
@@ -661,13 +653,9 @@ async def sync_client_meta_data(
         raise HTTPException(status_code=404, detail="Client not found or inactive")
 
     # Get token
-    token = db.query(MetaTokenDB).filter(
-        MetaTokenDB.client_id == client_id,
-        MetaTokenDB.access_token.isnot(None),
-        MetaTokenDB.ad_account_id.isnot(None)
-    ).first()
+    token = get_meta_credentials(db, client_id)
 
-    if not token:
+    if not token or not token.access_token or not token.ad_account_id:
         raise HTTPException(status_code=404, detail="No Meta account connected for this client")
 
     # Fetch insights from Meta
@@ -693,6 +681,8 @@ async def sync_client_meta_data(
     metrics_added = 0
     metrics_updated = 0
     unique_ads = set()
+    new_metrics = []  # Inserted in one batch after the loop
+    synced_dates = set()
 
     def extract_results(actions):
         if not actions:
@@ -729,6 +719,7 @@ async def sync_client_meta_data(
             date = datetime.strptime(date_str, "%Y-%m-%d")
         except:
             continue
+        synced_dates.add(date)
 
         # Extract metrics
         try:
@@ -794,7 +785,7 @@ async def sync_client_meta_data(
             existing.ad_set_name = insight.get("adset_name", existing.ad_set_name or "")
             metrics_updated += 1
         else:
-            metric = MetricDB(
+            new_metrics.append(dict(
                 client_id=client_id,
                 campaign_name=insight.get("campaign_name", ""),
                 ad_set_name=insight.get("adset_name", ""),
@@ -810,11 +801,16 @@ async def sync_client_meta_data(
                 ctr=ctr,
                 cost_per_result=cpr,
                 cpm=cpm
-            )
-            db.add(metric)
+            ))
             metrics_added += 1
 
+    bulk_copy_metrics(db, new_metrics)
+    if synced_dates:
+        refresh_metric_daily_summary(
+            db, client_id, min(synced_dates), max(synced_dates) + timedelta(days=1)
+        )
     db.commit()
+    invalidate_metrics_cache()
 
     return {
         "success": True,
@@ -840,7 +836,7 @@ async def quick_scale_campaign(
     """
     Quick action to increase a campaign's budget by a percentage.
     """
-    token = db.query(MetaTokenDB).filter(MetaTokenDB.client_id == client_id).first()
+    token = get_meta_credentials(db, client_id)
 
     if not token or not token.access_token:
         raise HTTPException(status_code=404, detail="No Meta account connected")
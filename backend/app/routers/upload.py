@@ -2,24 +2,17 @@
 Router para upload y procesamiento de CSVs
 """
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Request
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 
 from ..services.csv_processor import process_csv, get_campaign_summary
 from ..services.analysis import analyze_campaign
 from ..models.schemas import CampaignObjective, AnalysisResponse
 from ..auth import get_current_user
 from ..database import UserDB
-
-# Rate limiter - uses remote address as key
-def get_rate_limit_key(request: Request) -> str:
-    """Get rate limit key - user_id if authenticated, otherwise IP."""
-    auth_header = request.headers.get("Authorization", "")
-    if auth_header.startswith("Bearer "):
-        return f"user:{auth_header[:50]}"
-    return get_remote_address(request)
+from ..services.security import get_rate_limit_key
 
 limiter = Limiter(key_func=get_rate_limit_key)
 
@@ -51,8 +44,7 @@ async def upload_csv(
         raise HTTPException(status_code=400, detail="El archivo debe ser un CSV")
 
     try:
-        content = await file.read()
-        df = process_csv(content)
+        df = await run_in_threadpool(process_csv, file.file)
         summary = get_campaign_summary(df)
 
         return {
@@ -83,8 +75,7 @@ async def upload_and_analyze(
         raise HTTPException(status_code=400, detail="El archivo debe ser un CSV")
 
     try:
-        content = await file.read()
-        df = process_csv(content)
+        df = await run_in_threadpool(process_csv, file.file)
 
         # If no campaign specified, analyze the first one
         if campaign_name is None:
@@ -4,7 +4,7 @@ Limpia, normaliza y transforma los datos para análisis
 """
 import pandas as pd
 import numpy as np
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, BinaryIO, Union
 from io import BytesIO, StringIO
 
 
@@ -127,12 +127,13 @@ def clean_numeric(value) -> float:
     return 0.0
 
 
-def process_csv(file_content: bytes, encoding: str = 'utf-8') -> pd.DataFrame:
+def process_csv(file_content: Union[bytes, BinaryIO], encoding: str = 'utf-8') -> pd.DataFrame:
     """
     Procesa un archivo CSV de Meta Ads y retorna un DataFrame normalizado.
 
     Args:
-        file_content: Contenido del archivo CSV en bytes
+        file_content: Contenido del archivo CSV en bytes, o un archivo binario
+            con seek() (p.ej. UploadFile.file) para leerlo sin copiarlo a memoria
         encoding: Codificación del archivo
 
     Returns:
@@ -141,10 +142,13 @@ def process_csv(file_content: bytes, encoding: str = 'utf-8') -> pd.DataFrame:
     # Try different encodings if default fails
     encodings_to_try = [encoding, 'utf-8', 'latin-1', 'cp1252']
 
+    source = BytesIO(file_content) if isinstance(file_content, bytes) else file_content
+
     df = None
     for enc in encodings_to_try:
         try:
-            df = pd.read_csv(BytesIO(file_content), encoding=enc)
+            source.seek(0)
+            df = pd.read_csv(source, encoding=enc)
             break
         except UnicodeDecodeError:
             continue
@@ -2,6 +2,7 @@
 Security service for Emiti Metrics
 IP whitelisting, intrusion detection, and account lockout
 """
+import hashlib
 import ipaddress
 import logging
 from datetime import datetime, timedelta
@@ -9,6 +10,8 @@ from typing import Optional, List
 from collections import defaultdict
 import time
 
+from fastapi import Request
+from slowapi.util import get_remote_address
 from sqlalchemy.orm import Session
 
 from ..database import UserDB, LoginHistoryDB, SecurityAlertDB
@@ -30,6 +33,35 @@ RAPID_REQUEST_THRESHOLD = 20  # Requests per minute
 _request_tracker: dict = defaultdict(list)
 
 
+def get_rate_limit_key(request: Request) -> str:
+    """Get rate limit key - token hash if authenticated, otherwise IP."""
+    # Computed once per request even when several limits apply
+    scope = request.scope
+    key = scope.get("rate_limit_key")
+    if key:
+        return key
+
+    key = None
+    for name, value in scope["headers"]:  # raw bytes; avoids building a Headers view
+        if name == b"authorization":
+            if value.startswith(b"Bearer "):
+                # Fixed 16-char key over the whole token: no token fragments in limiter
+                # storage, and users no longer share a bucket via the common JWT header prefix
+                key = "user:" + hashlib.blake2b(value[7:], digest_size=8).hexdigest()
+            break
+    if key is None:
+        key = get_remote_address(request)
+
+    scope["rate_limit_key"] = key
+    return key
+
+
+def get_client_ip(request: Request) -> str:
+    """Client IP straight from the ASGI scope (no Address namedtuple per call)."""
+    client = request.scope.get("client")
+    return client[0] if client else "unknown"
+
+
 def check_ip_allowed(user: UserDB, client_ip: str) -> bool:
     """
     Check if IP is allowed for this user.
@@ -131,6 +131,11 @@ def parse_user_agent(user_agent: str) -> dict:
     return result
 
 
+def hash_session_token(token: str) -> bytes:
+    """SHA-256 digest of an access token, as stored in SessionDB.token_hash."""
+    return hashlib.sha256(token.encode()).digest()
+
+
 def get_ip_info(ip_address: str) -> dict:
     """Get basic info about an IP address."""
     result = {
@@ -252,7 +257,7 @@ class SessionManager:
         self,
         user_id: int,
         fingerprint: DeviceFingerprint,
-        token_hash: str
+        token_hash: bytes
     ) -> dict:
         """
         Create a new session with fingerprint tracking.
@@ -292,7 +297,6 @@ class SessionManager:
             ip_address=fingerprint.ip_address,
             user_agent=fingerprint.user_agent,
             is_active=True,
-            created_at=datetime.utcnow(),
             expires_at=datetime.utcnow() + timedelta(hours=self.SESSION_TIMEOUT_HOURS),
         )
 
@@ -353,7 +357,7 @@ class SessionManager:
 
         return False
 
-    def revoke_all_sessions(self, user_id: int, except_current: str = None) -> int:
+    def revoke_all_sessions(self, user_id: int, except_current: bytes = None) -> int:
         """Revoke all sessions for a user, optionally keeping current."""
         from ..database import SessionDB
 
@@ -377,7 +381,7 @@ class SessionManager:
         self.db.commit()
         return count
 
-    def update_activity(self, token_hash: str):
+    def update_activity(self, token_hash: bytes):
         """Update last activity timestamp for a session."""
         from ..database import SessionDB
 
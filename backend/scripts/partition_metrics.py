@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Monthly range partitioning for the metrics table (PostgreSQL only)
+
+Usage:
+    python partition_metrics.py convert                # Convert metrics to a partitioned table
+    python partition_metrics.py ensure [months]        # Create partitions for the next N months (default: 3)
+    python partition_metrics.py drop-before YYYY-MM    # Drop partitions (and their daily summaries) before that month
+    python partition_metrics.py list                   # List existing partitions
+
+Queries filtered by date only touch the matching monthly partitions, and
+retention becomes a DROP TABLE of old partitions instead of a slow DELETE.
+Rows outside every monthly range land in metrics_default so inserts never fail.
+
+Environment Variables:
+    DATABASE_URL        - PostgreSQL connection string (required)
+"""
+import os
+import re
+import sys
+import logging
+from datetime import date
+from typing import List
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load .env file before importing app modules
+from dotenv import load_dotenv
+env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.env')
+load_dotenv(env_path)
+
+from sqlalchemy import text
+from app.database import engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+TABLE = "metrics"
+SUMMARY_TABLE = "metric_daily_summary"
+DEFAULT_MONTHS_AHEAD = 3
+PARTITION_NAME_RE = re.compile(r"^metrics_(\d{4})_(\d{2})$")
+
+# Indexes declared on MetricDB, recreated on the partitioned parent
+PARENT_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_metric_client_date ON metrics (client_id, date)",
+    "CREATE INDEX IF NOT EXISTS ix_metric_campaign_date ON metrics (campaign_id, date)",
+    "CREATE INDEX IF NOT EXISTS ix_metric_client_ad_date ON metrics (client_id, ad_id, date)",
+]
+
+
+def add_months(month_start: date, months: int) -> date:
+    """Return the first day of the month `months` after month_start."""
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month_start: date) -> str:
+    return f"{TABLE}_{month_start.year:04d}_{month_start.month:02d}"
+
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name)"
+    ), {"name": TABLE}).scalar()
+
+
+def create_month_partition(conn, month_start: date) -> None:
+    """Create the partition for one month if it does not exist yet."""
+    name = partition_name(month_start)
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{add_months(month_start, 1).isoformat()}')"
+    ))
+
+
+def convert() -> bool:
+    """
+    Replace the plain metrics table with a partitioned one and copy its rows.
+
+    PostgreSQL requires the partition key in the primary key, so the new
+    table uses PRIMARY KEY (id, date). ids keep coming from the same sequence.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            logger.info("metrics is already partitioned")
+            return True
+
+        oldest = conn.execute(text(f"SELECT MIN(date) FROM {TABLE}")).scalar()
+        first_month = (oldest.date() if oldest else date.today()).replace(day=1)
+
+        # Index names are schema-wide, so move the old primary key out of the way
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_legacy"))
+        conn.execute(text(f"ALTER INDEX {TABLE}_pkey RENAME TO {TABLE}_legacy_pkey"))
+        conn.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY NONE"))
+        conn.execute(text(
+            f"CREATE TABLE {TABLE} (LIKE {TABLE}_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS, "
+            f"PRIMARY KEY (id, date)) PARTITION BY RANGE (date)"
+        ))
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+
+        month = first_month
+        while month <= add_months(date.today().replace(day=1), DEFAULT_MONTHS_AHEAD):
+            create_month_partition(conn, month)
+            month = add_months(month, 1)
+
+        conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_legacy"))
+        conn.execute(text(
+            f"ALTER TABLE {TABLE} ADD FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE"
+        ))
+        conn.execute(text(
+            f"ALTER TABLE {TABLE} ADD FOREIGN KEY (campaign_id) REFERENCES campaigns (id) ON DELETE CASCADE"
+        ))
+        conn.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id"))
+        conn.execute(text(f"DROP TABLE {TABLE}_legacy"))
+
+        for statement in PARENT_INDEXES:
+            conn.execute(text(statement))
+
+    logger.info(f"Converted metrics to monthly partitions starting {first_month.isoformat()}")
+    return True
+
+
+def ensure_partitions(months_ahead: int = DEFAULT_MONTHS_AHEAD) -> int:
+    """Create partitions from the current month through `months_ahead` months."""
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            logger.error("metrics is not partitioned. Run: python partition_metrics.py convert")
+            return 0
+        month = date.today().replace(day=1)
+        for i in range(months_ahead + 1):
+            create_month_partition(conn, add_months(month, i))
+    logger.info(f"Ensured partitions through {partition_name(add_months(month, months_ahead))}")
+    return months_ahead + 1
+
+
+def list_partitions() -> List[str]:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name ORDER BY c.relname"
+        ), {"name": TABLE}).scalars().all()
+    return list(rows)
+
+
+def drop_partitions_before(cutoff: date) -> int:
+    """
+    Drop every monthly partition whose range ends on or before cutoff.
+
+    The metric_daily_summary rows for each dropped month are deleted in the
+    same transaction, so the summary never reports metrics that are gone.
+    """
+    dropped = 0
+    with engine.begin() as conn:
+        for name in list_partitions():
+            match = PARTITION_NAME_RE.match(name)
+            if not match:
+                continue
+            month_start = date(int(match.group(1)), int(match.group(2)), 1)
+            month_end = add_months(month_start, 1)
+            if month_end <= cutoff:
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                summary_rows = conn.execute(text(
+                    f"DELETE FROM {SUMMARY_TABLE} WHERE date >= :start AND date < :end"
+                ), {"start": month_start, "end": month_end}).rowcount
+                logger.info(f"Dropped partition {name} and {summary_rows} summary row(s)")
+                dropped += 1
+    return dropped
+
+
+def print_usage():
+    print(__doc__)
+
+
+def main():
+    """Main entry point for CLI."""
+    if engine.dialect.name != "postgresql":
+        print("Error: partitioning is only supported on PostgreSQL")
+        sys.exit(1)
+
+    if len(sys.argv) < 2:
+        print_usage()
+        sys.exit(1)
+
+    command = sys.argv[1].lower()
+
+    if command == "convert":
+        sys.exit(0 if convert() else 1)
+
+    elif command == "ensure":
+        months = DEFAULT_MONTHS_AHEAD
+        if len(sys.argv) >= 3:
+            try:
+                months = int(sys.argv[2])
+            except ValueError:
+                print(f"Error: Invalid number of months: {sys.argv[2]}")
+                sys.exit(1)
+        sys.exit(0 if ensure_partitions(months) else 1)
+
+    elif command == "drop-before":
+        if len(sys.argv) < 3:
+            print("Error: Please specify the first month to keep")
+            print("Usage: python partition_metrics.py drop-before YYYY-MM")
+            sys.exit(1)
+        try:
+            year, month = sys.argv[2].split("-")
+            cutoff = date(int(year), int(month), 1)
+        except ValueError:
+            print(f"Error: Invalid month: {sys.argv[2]}")
+            sys.exit(1)
+        removed = drop_partitions_before(cutoff)
+        print(f"Dropped {removed} partition(s)")
+        sys.exit(0)
+
+    elif command == "list":
+        for name in list_partitions():
+            print(name)
+        sys.exit(0)
+
+    elif command in ["--help", "-h", "help"]:
+        print_usage()
+        sys.exit(0)
+
+    else:
+        print(f"Unknown command: {command}")
+        print_usage()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ Designed to run 3 times daily via cron/systemd timer.
 import asyncio
 import sys
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
 # Add parent directory to path
@@ -20,7 +20,7 @@ env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__
 load_dotenv(env_path)
 
 from sqlalchemy.orm import Session
-from app.database import SessionLocal, MetaTokenDB, ClientDB, MetricDB
+from app.database import SessionLocal, MetaTokenDB, ClientDB, MetricDB, bulk_copy_metrics, refresh_metric_daily_summary
 from app.services.meta_oauth import meta_oauth_service
 
 # Configuration
@@ -89,6 +89,8 @@ async def sync_client(db: Session, client: ClientDB, token: MetaTokenDB) -> dict
 
         # Track unique ads
         unique_ads = set()
+        new_metrics = []  # Inserted in one batch after the loop
+        synced_dates = set()
 
         for insight in insights_list:
             ad_id = insight.get("ad_id", "")
@@ -107,6 +109,7 @@ async def sync_client(db: Session, client: ClientDB, token: MetaTokenDB) -> dict
                 date = datetime.strptime(date_str, "%Y-%m-%d")
             except:
                 continue
+            synced_dates.add(date)
 
             # Extract metrics - Meta returns strings
             try:
@@ -178,7 +181,7 @@ async def sync_client(db: Session, client: ClientDB, token: MetaTokenDB) -> dict
                 stats["metrics_updated"] += 1
             else:
                 # Create new
-                metric = MetricDB(
+                new_metrics.append(dict(
                     client_id=client.id,
                     campaign_name=insight.get("campaign_name", ""),
                     ad_set_name=insight.get("adset_name", ""),
@@ -194,10 +197,14 @@ async def sync_client(db: Session, client: ClientDB, token: MetaTokenDB) -> dict
                     ctr=ctr,
                     cost_per_result=cpr,
                     cpm=cpm
-                )
-                db.add(metric)
+                ))
                 stats["metrics_added"] += 1
 
+        bulk_copy_metrics(db, new_metrics)
+        if synced_dates:
+            refresh_metric_daily_summary(
+                db, client.id, min(synced_dates), max(synced_dates) + timedelta(days=1)
+            )
         db.commit()
         stats["ads"] = len(unique_ads)
         total_metrics = stats["metrics_added"] + stats["metrics_updated"]
@@ -1,30 +1,41 @@
 """
 Test configuration and fixtures for Emiti Metrics.
 """
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db
 
 
-# Test database - in-memory SQLite
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# Test database - temporary SQLite file, so the sync and async (aiosqlite)
+# engines see the same tables
+TEST_DB_DIR = tempfile.mkdtemp(prefix="emiti-metrics-test-")
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# NullPool: each TestClient runs its own event loop, so connections must not
+# be reused across tests
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DB_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 
 def override_get_db():
     """Override database dependency for testing."""
@@ -35,6 +46,20 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    """Override async database dependency for testing."""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database_file():
+    """Remove the temporary database once the session ends."""
+    yield TEST_DB_PATH
+    engine.dispose()
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
+
+
 @pytest.fixture(scope="function")
 def db():
     """Create a fresh database for each test."""
@@ -49,6 +74,7 @@ def db():
 def client(db):
     """Create a test client with database override."""
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     Base.metadata.create_all(bind=engine)
 
     with TestClient(app) as test_client:
@@ -0,0 +1,64 @@
+"""
+Tests for the alerts router
+"""
+import pytest
+from sqlalchemy import update
+
+from app.auth import create_access_token
+from app.database import AlertDB, ClientDB
+
+
+@pytest.fixture
+def auth_headers():
+    """Bearer header for an active user carried in the token claims."""
+    token = create_access_token({"sub": "1", "email": "alerts@test.com", "role": "admin", "active": True})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def add_alert(db, alert_id, severity, acknowledged, client_id="client_1"):
+    db.add(AlertDB(
+        id=alert_id,
+        client_id=client_id,
+        type="ROAS_DROP",
+        severity=severity,
+        title="ROAS drop",
+        message="ROAS dropped",
+        acknowledged=acknowledged,
+    ))
+
+
+class TestAlertsCount:
+    """GET /api/alerts/count"""
+
+    def test_counts_only_unacknowledged_with_exact_severity(self, client, db, auth_headers):
+        db.add(ClientDB(id="client_1", name="Client 1"))
+        add_alert(db, "a1", "CRITICAL", False)
+        add_alert(db, "a2", "WARNING", False)
+        add_alert(db, "a3", "INFO", True)
+        add_alert(db, "a4", "critical", False)  # not one of the stored severity values
+        add_alert(db, "a5", "CRITICAL", False)
+        db.commit()
+        # Rows written before the column default existed: neither acknowledged nor active
+        db.execute(update(AlertDB).where(AlertDB.id == "a5").values(acknowledged=None))
+        db.commit()
+
+        response = client.get("/api/alerts/count", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == {
+            "total": 5,
+            "active": 3,
+            "by_severity": {"critical": 1, "warning": 1, "info": 0}
+        }
+
+    def test_filters_by_client(self, client, db, auth_headers):
+        db.add_all([ClientDB(id="client_1", name="Client 1"), ClientDB(id="client_2", name="Client 2")])
+        add_alert(db, "a1", "CRITICAL", False)
+        add_alert(db, "a2", "WARNING", False, client_id="client_2")
+        db.commit()
+
+        response = client.get("/api/alerts/count", params={"client_id": "client_2"}, headers=auth_headers)
+        assert response.json() == {
+            "total": 1,
+            "active": 1,
+            "by_severity": {"critical": 0, "warning": 1, "info": 0}
+        }
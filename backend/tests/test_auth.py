@@ -0,0 +1,119 @@
+"""
+Tests for access-token claims in get_current_user / get_current_db_user
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+import pytest
+
+from app.auth import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    create_access_token,
+    decode_token,
+    invalidate_user,
+    user_token_claims,
+    verify_refresh_token,
+)
+from app.database import RefreshTokenDB, UserDB
+
+
+@pytest.fixture
+def admin_user(db):
+    """Active admin user stored in the test database."""
+    user = UserDB(
+        email="claims@test.com",
+        hashed_password="not-used",
+        name="Claims Test",
+        role="admin",
+        is_active=True,
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def admin_headers(admin_user):
+    """Bearer header for an access token issued to admin_user."""
+    token = create_access_token(
+        user_token_claims(admin_user),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestAccessTokenClaims:
+    """Claims embedded at issue time are trusted until the token expires"""
+
+    def test_me_reads_role_from_claims(self, client, admin_headers):
+        response = client.get("/api/auth/me", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["role"] == "admin"
+
+    def test_claims_outlive_db_changes_until_expiry(self, client, db, admin_user, admin_headers):
+        """Deactivating or demoting a user takes effect at the next token refresh"""
+        admin_user.is_active = False
+        admin_user.role = "viewer"
+        db.commit()
+        invalidate_user(admin_user.id)  # does not affect tokens that carry claims
+
+        response = client.get("/api/auth/me", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.json()["role"] == "admin"
+
+    def test_db_user_dependency_sees_deactivation(self, client, db, admin_user, admin_headers):
+        """Endpoints using get_current_db_user check the current database row"""
+        admin_user.is_active = False
+        db.commit()
+
+        response = client.post("/api/auth/2fa/setup", headers=admin_headers)
+        assert response.status_code == 403
+        assert response.json()["detail"] == "User account is disabled"
+
+    def test_default_lifetime_is_short(self, admin_user):
+        """Claims are trusted until expiry, so tokens default to the short lifetime"""
+        payload = decode_token(create_access_token(user_token_claims(admin_user)))
+        assert payload["exp"] - payload["iat"] == ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+    def test_token_without_claims_uses_database(self, client, db, admin_user):
+        """Legacy tokens with only "sub" are resolved from the database"""
+        admin_user.is_active = False
+        db.commit()
+        token = create_access_token({"sub": str(admin_user.id)})
+
+        response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
+
+
+class TestAsyncCurrentUser:
+    """get_current_user_async, used by routers on get_async_db"""
+
+    def test_inactive_claims_rejected(self, client):
+        token = create_access_token({"sub": "1", "email": "off@test.com", "role": "user", "active": False})
+        response = client.get("/api/alerts/count", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
+
+    def test_unknown_user_without_claims_rejected(self, client):
+        token = create_access_token({"sub": "999999"})
+        response = client.get("/api/alerts/count", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
+
+
+class TestRefreshTokenLookup:
+    """Refresh tokens issued before the BLAKE2b digest switch"""
+
+    def test_legacy_sha256_digest_still_accepted(self, db, admin_user):
+        raw_token = "legacy-refresh-token"
+        db.add(RefreshTokenDB(
+            user_id=admin_user.id,
+            token_hash=hashlib.sha256(raw_token.encode()).digest(),
+            expires_at=int(time.time()) + 3600,
+            is_revoked=False,
+        ))
+        db.commit()
+
+        refresh_token = verify_refresh_token(raw_token, db)
+        assert refresh_token is not None
+        assert refresh_token.user_id == admin_user.id
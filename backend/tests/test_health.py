@@ -1,7 +1,12 @@
 """
 Health and basic endpoint tests for Emiti Metrics.
 """
+import time
+
 import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
 
 
 class TestHealthEndpoints:
@@ -22,6 +27,24 @@ class TestHealthEndpoints:
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
 
+    def test_readiness_endpoint_ready(self, client):
+        """Test readiness probe turns ready once startup seeding finishes."""
+        deadline = time.monotonic() + 10
+        response = client.get("/health/ready")
+        while response.status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+            response = client.get("/health/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+
+    def test_readiness_endpoint_starting(self, monkeypatch):
+        """Test readiness probe returns 503 while the app is not ready."""
+        # No lifespan (no `with`), so the startup seed task can't flip the flag
+        monkeypatch.setattr(app.state, "ready", False, raising=False)
+        response = TestClient(app).get("/health/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "starting"}
+
     def test_security_headers_present(self, client):
         """Test that security headers are set."""
         response = client.get("/health")